@@ -0,0 +1,82 @@
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.services import vector_index
+
+TYPES = ["flat", "flat_fp16", "hnsw", "ivf_flat", "ivf_fp16", "ivf_pq"]
+
+
+def synthetic_vectors(count, dim, clusters, rng):
+    # Clustered data: uniform random vectors make every ANN index look bad.
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.3 * rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def recall(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def measure(index_type, vectors, queries, truth, k):
+    spec = vector_index.factory_string(index_type, len(vectors), vectors.shape[1])
+    started = time.perf_counter()
+    index = vector_index.build_index(vectors, spec)
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        _, rows = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        found.append(rows[0])
+    latencies = np.array(latencies) * 1000
+    return {
+        "type": index_type,
+        "spec": spec,
+        "build_s": round(build_seconds, 2),
+        "bytes": int(faiss.serialize_index(index).size),
+        f"recall@{k}": round(recall(found, truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def run(count, dim, queries, k, types):
+    rng = np.random.default_rng(0)
+    clusters = max(1, count // 500)
+    vectors = synthetic_vectors(count, dim, clusters, rng)
+    query_vectors = synthetic_vectors(queries, dim, clusters, rng)
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(query_vectors, k)
+
+    return {
+        "count": count,
+        "dim": dim,
+        "queries": queries,
+        "nprobe": vector_index.VECTOR_INDEX_NPROBE,
+        "ef_search": vector_index.VECTOR_INDEX_EF_SEARCH,
+        "selected": vector_index.select_type(count),
+        "results": [measure(t, vectors, query_vectors, truth, k) for t in types],
+    }
+
+
+# Recall against exact search versus per-query latency and index size for
+# every index type, on synthetic vectors so it runs without an embedding API.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector index recall vs latency")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=TYPES, choices=TYPES)
+    args = parser.parse_args()
+    print(json.dumps(run(args.count, args.dim, args.queries, args.k, args.types), indent=2))
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from collections import Counter
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(latencies, elapsed, **extra):
+    report = dict(extra)
+    report["throughput_per_s"] = round(len(latencies) / elapsed, 2) if elapsed else 0
+    if latencies:
+        report["p50_ms"] = round(percentile(latencies, 0.50) * 1000, 2)
+        report["p95_ms"] = round(percentile(latencies, 0.95) * 1000, 2)
+        report["p99_ms"] = round(percentile(latencies, 0.99) * 1000, 2)
+    return report
+
+
+async def run_concurrent(call, requests, concurrency):
+    """Runs ``call(i)`` for ``i`` in ``range(requests)`` from ``concurrency``
+    clients. ``call`` returns an HTTP status; latencies are kept for 2xx
+    responses only and every status is counted."""
+    latencies = []
+    statuses = Counter()
+    indexes = iter(range(requests))
+
+    async def client():
+        for index in indexes:
+            started = time.perf_counter()
+            try:
+                status = await call(index)
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+                continue
+            statuses[str(status)] += 1
+            if 200 <= status < 300:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return summarize(
+        latencies,
+        elapsed,
+        requests=requests,
+        concurrency=concurrency,
+        errors=requests - len(latencies),
+        statuses=dict(statuses),
+    )
@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import json
+import time
+
+from app.benchmarks.harness import summarize
+from app.utils import passwords
+
+
+async def run(concurrency, requests, rounds):
+    hashed = passwords.hash_password("benchmark-password", rounds)
+    latencies = []
+    shed = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def client():
+        nonlocal shed
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await passwords.verify_password("benchmark-password", hashed)
+            except passwords.PasswordPoolBusy:
+                shed += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return summarize(
+        latencies,
+        elapsed,
+        rounds=rounds,
+        workers=passwords.BCRYPT_WORKERS,
+        concurrency=concurrency,
+        requests=requests,
+        shed=shed,
+    )
+
+
+# Measures the password-verification step of login through the bcrypt pool,
+# without MongoDB, so cost and pool settings can be compared on one machine.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bcrypt login throughput")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=passwords.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.concurrency, args.requests, args.rounds)), indent=2))
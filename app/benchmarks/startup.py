@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so nothing is already imported or cached.
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "llm_loaded": "app.services.llm" in sys.modules,
+}))
+"""
+
+
+def probe(llm_enabled):
+    env = dict(os.environ, LLM_ENABLED="true" if llm_enabled else "false")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeats):
+    report = {}
+    for name, llm_enabled in (("auth_only", False), ("full", True)):
+        samples = [probe(llm_enabled) for _ in range(repeats)]
+        seconds = [sample["seconds"] for sample in samples]
+        report[name] = {
+            "import_median_s": round(statistics.median(seconds), 3),
+            "import_max_s": round(max(seconds), 3),
+            "max_rss_kb": max(sample["max_rss_kb"] for sample in samples),
+            "modules": samples[-1]["modules"],
+            "llm_loaded": samples[-1]["llm_loaded"],
+        }
+    return report
+
+
+# Time and memory to import app.main, the cost a worker pays before serving,
+# with and without the LLM/RAG routes.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="app.main import time")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeats), indent=2))
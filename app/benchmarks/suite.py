@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from app.benchmarks.harness import run_concurrent, summarize
+
+PASSWORD = "benchmark-password"
+SEED_BATCH = 10000
+PDF_LINES_PER_PAGE = 40
+WORDS = (
+    "revenue region quarter growth margin forecast customer product order "
+    "supplier shipment invoice balance audit policy contract renewal churn"
+).split()
+
+
+def configure(workdir):
+    """Points the app at local stand-ins. Runs before any app module is
+    imported, since settings are read at import; variables already set in
+    the environment win, so a local mongod or the real models can be used."""
+    defaults = {
+        "MONGO_URI": "mongomock://localhost",
+        "CHAT_BACKEND": "fake",
+        "EMBEDDING_BACKEND": "fake",
+        "ENVIRONMENT": "development",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "720",
+        # The suite measures throughput, not the per-user rate limits.
+        "LLM_RATE_USER": "0",
+        "LLM_RATE_MODERATOR": "0",
+        "DOCUMENT_DIR": os.path.join(workdir, "documents"),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "EMBEDDING_CACHE_DIR": os.path.join(workdir, "embedding_cache"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_csv(rows, seed):
+    rng = random.Random(seed)
+    lines = ["id,region,quarter,amount,notes"]
+    for row in range(rows):
+        lines.append(
+            f"{seed}-{row},{rng.choice(WORDS)},Q{rng.randint(1, 4)},"
+            f"{rng.randint(100, 99999)},{sentence(rng)}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def synthetic_pdf(pages, seed):
+    # A minimal text PDF (one Helvetica content stream per page), written by
+    # hand so the suite needs no PDF library beyond the app's own parser.
+    rng = random.Random(seed)
+    page_ids = [4 + 2 * page for page in range(pages)]
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id in page_ids:
+        text = " ".join(f"({seed} {sentence(rng)}) '" for _ in range(PDF_LINES_PER_PAGE))
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {text} ET".encode()
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = (
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number in sorted(objects):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref
+    )
+    return bytes(out)
+
+
+async def seed_users(users_collection, start, stop, hashed):
+    # Every user shares one hash: hashing a million passwords would dominate
+    # the run and measures nothing the login scenario does not.
+    now = int(time.time())
+    ids = []
+    for first in range(start, stop, SEED_BATCH):
+        documents = [
+            {
+                "email": f"user{i}@bench.example.com",
+                "password": hashed,
+                "full_name": f"Bench User {i}",
+                "role": "moderator" if i % 10 == 0 else "user",
+                "created_at": now - i,
+            }
+            for i in range(first, min(stop, first + SEED_BATCH))
+        ]
+        result = await users_collection.insert_many(documents, ordered=False)
+        ids.extend(str(i) for i in result.inserted_ids)
+    return ids
+
+
+async def login_token(client, email):
+    response = await client.post("/login/", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def admin_paging(client, pages, limit):
+    latencies = []
+    cursor = None
+    started = time.perf_counter()
+    for _ in range(pages):
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        page_started = time.perf_counter()
+        response = await client.get("/admin/users", params=params)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - page_started)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return summarize(latencies, time.perf_counter() - started, pages=len(latencies), limit=limit)
+
+
+async def run(args):
+    import httpx
+
+    from app.config.db_config import users_collection
+    from app.main import app
+    from app.utils import passwords
+
+    transport = httpx.ASGITransport(app=app)
+
+    def client(token=None):
+        cookies = {"access_token": token} if token else None
+        return httpx.AsyncClient(
+            transport=transport, base_url="http://bench", cookies=cookies, timeout=None
+        )
+
+    results = []
+
+    def record(scenario, report, **params):
+        # A rejected request is not a sample; numbers from a run with
+        # failures would describe a different workload.
+        if report.get("errors"):
+            raise RuntimeError(f"{scenario} failed: {report['statuses']}")
+        report = {"scenario": scenario, **params, **report}
+        results.append(report)
+        if args.verbose:
+            print(json.dumps(report))
+
+    async with app.router.lifespan_context(app):
+        hashed = passwords.hash_password(PASSWORD, passwords.BCRYPT_ROUNDS)
+        await users_collection.insert_one({
+            "email": "admin@bench.example.com",
+            "password": hashed,
+            "full_name": "Bench Admin",
+            "role": "admin",
+            "created_at": int(time.time()),
+        })
+
+        anonymous = client()
+        admin = client(await login_token(anonymous, "admin@bench.example.com"))
+        user = None
+        seeded = 0
+
+        for size in sorted(set(args.users)):
+            ids = await seed_users(users_collection, seeded, size, hashed)
+            seeded = size
+
+            if user is None:
+                # Login and profile reads are measured once, at the smallest
+                # size; their cost does not depend on the number of users.
+                user = client(await login_token(anonymous, "user1@bench.example.com"))
+
+                async def do_login(i):
+                    email = f"user{i % seeded}@bench.example.com"
+                    response = await anonymous.post(
+                        "/login/", json={"email": email, "password": PASSWORD}
+                    )
+                    return response.status_code
+
+                record("login", await run_concurrent(
+                    do_login, args.login_requests, args.concurrency
+                ), users=size, rounds=passwords.BCRYPT_ROUNDS)
+
+                async def do_get_user(i, ids=ids):
+                    response = await user.get(f"/user/{ids[i % len(ids)]}")
+                    return response.status_code
+
+                record("user_get", await run_concurrent(
+                    do_get_user, args.requests, args.concurrency
+                ), users=size)
+
+            async def do_first_page(i):
+                params = {"limit": args.page_size}
+                if i % 2:
+                    params["role"] = "moderator"
+                response = await admin.get("/admin/users", params=params)
+                return response.status_code
+
+            record("admin_users_first_page", await run_concurrent(
+                do_first_page, args.requests, args.concurrency
+            ), users=size, limit=args.page_size)
+            record("admin_users_paging", await admin_paging(
+                admin, args.pages, args.page_size
+            ), users=size)
+
+        if args.llm:
+            for kind, sizes, build, name in (
+                ("csv", args.csv_rows, synthetic_csv, "bench.csv"),
+                ("pdf", args.pdf_pages, synthetic_pdf, "bench.pdf"),
+            ):
+                for size in sizes:
+                    payloads = [build(size, seed) for seed in range(args.ingest_repeats)]
+
+                    async def do_ingest(i, payloads=payloads, name=name):
+                        response = await user.post(
+                            "/rag/documents", files={"file": (name, payloads[i])}
+                        )
+                        return response.status_code
+
+                    record(f"ingest_{kind}", await run_concurrent(
+                        do_ingest, len(payloads), 1
+                    ), size=size, bytes=len(payloads[0]))
+
+            async def do_chat(i):
+                response = await user.post("/llm", data={
+                    "message": f"question {i}: {sentence(random.Random(i))}",
+                    "session_id": f"bench-{i % args.sessions}",
+                    "cache": "false",
+                })
+                return response.status_code
+
+            record("llm_chat", await run_concurrent(
+                do_chat, args.llm_requests, args.llm_concurrency
+            ), sessions=args.sessions)
+
+        for open_client in (anonymous, admin, user):
+            await open_client.aclose()
+
+    return {
+        "mongo": os.environ["MONGO_URI"].split("://")[0],
+        "chat_backend": os.environ["CHAT_BACKEND"],
+        "embedding_backend": os.environ["EMBEDDING_BACKEND"],
+        "results": results,
+    }
+
+
+# End-to-end requests through the ASGI app with an in-process MongoDB
+# stand-in and fake chat/embedding models, so it runs without network
+# access or API keys. Point MONGO_URI at a local mongod (MONGO_TLS=false)
+# for realistic database numbers at the larger user counts.
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark suite")
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--login-requests", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--no-llm", dest="llm", action="store_false",
+                        help="skip ingest and chat (auth/admin only)")
+    parser.add_argument("--csv-rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--ingest-repeats", type=int, default=3)
+    parser.add_argument("--llm-requests", type=int, default=500)
+    parser.add_argument("--llm-concurrency", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print each scenario as it finishes")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        configure(workdir)
+        if not args.llm:
+            os.environ.setdefault("LLM_ENABLED", "false")
+        report = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,12 +1,57 @@
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from motor.motor_asyncio import AsyncIOMotorClient
 import certifi
 import os
 from dotenv import load_dotenv
+from app.utils.metrics import CommandMetrics, metrics
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE") or "100")
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE") or "0")
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS") or "300000")
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS") or "5000")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS") or "5000")
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS") or "20000")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS") or "2000")
+# Set to false for a local mongod without TLS.
+MONGO_TLS = (os.getenv("MONGO_TLS") or "true") == "true"
+
+client_options = {
+    "server_api": ServerApi("1"),
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+    "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+    "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+    "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    "event_listeners": [CommandMetrics(metrics)],
+}
+if MONGO_TLS:
+    client_options["tlsCAFile"] = certifi.where()
+
+# Request handlers use the async client. The synchronous client is kept for
+# code that already runs on its own thread (change-stream listeners).
+if MONGO_URI and MONGO_URI.startswith("mongomock://"):
+    # In-process stand-in for offline benchmarks: nothing is persisted, the
+    # two clients do not share data and change streams are unsupported.
+    import mongomock
+    from mongomock_motor import AsyncMongoMockClient
+
+    client = mongomock.MongoClient()
+    async_client = AsyncMongoMockClient()
+else:
+    client = MongoClient(MONGO_URI, **client_options)
+    async_client = AsyncIOMotorClient(MONGO_URI, **client_options)
 
-client = MongoClient(MONGO_URI, tlsCAFile=certifi.where(), server_api=ServerApi("1"))
 db = client.llm_db
 collection = db["llm_collection"]
+
+async_db = async_client.llm_db
+users_collection = async_db["llm_collection"]
+documents_collection = async_db["documents"]
+conversations_collection = async_db["conversations"]
+jobs_collection = async_db["ingest_jobs"]
+collections_collection = async_db["document_collections"]
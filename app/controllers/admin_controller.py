@@ -1,45 +1,189 @@
-from app.config.db_config import collection
-from app.models.schema import all_users
-from fastapi import HTTPException, status
+from app.repositories import user_repository
+from app.models.schema import all_users, ALLOWED_ROLES, RoleUpdate, UserCreate
+from app.services.workers import run_blocking
+from app.utils.passwords import hash_passwords
+from fastapi import HTTPException, UploadFile, status
 from fastapi.responses import JSONResponse
-from bson import ObjectId
 from app.models.schema import individual_user
+from app.utils.streaming import ndjson_response
+from app.services.user_cache import user_cache
+from app.services.token_revocation import token_revocations
+from app.repositories.query_audit import audit_queries
+from bson import ObjectId
+from datetime import datetime
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+import csv
+import io
+import json
+import os
+
+BULK_WRITE_BATCH = int(os.getenv("BULK_WRITE_BATCH") or "1000")
 
 
 
 # Read Users
-async def get_all_users():
+async def get_all_users(role=None, email_prefix=None, cursor=None, limit=100, sort="_id"):
     try:
-        data = collection.find()
-        return all_users(data)
+        query = user_repository.listing_filter(role, email_prefix)
+        data, next_cursor = await user_repository.find_page(query, sort, cursor, limit)
+        # The body stays a plain list; the next page is advertised in a header.
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return JSONResponse(content=all_users(data), headers=headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Export Users
+async def export_users(role=None, email_prefix=None, sort="_id"):
+    query = user_repository.listing_filter(role, email_prefix)
+
+    async def rows():
+        async for user in user_repository.iterate(query, sort):
+            yield individual_user(user)
+
+    return ndjson_response(rows())
+
+
 # Bulk Delete Users
 async def bulk_delete_users(user_ids: list):
     try:
-        object_ids = [ObjectId(id) for id in user_ids]
-        result = collection.delete_many({"_id": {"$in": object_ids}})
-        return {"message": f"Users deleted successfully: {result.deleted_count} users removed"}
+        valid_ids = [user_id for user_id in user_ids if ObjectId.is_valid(user_id)]
+        invalid_ids = [user_id for user_id in user_ids if not ObjectId.is_valid(user_id)]
+        deleted_count = await user_repository.delete_many(valid_ids) if valid_ids else 0
+        user_cache.invalidate(*valid_ids)
+        for user_id in valid_ids:
+            token_revocations.revoke(user_id)
+        return {
+            "message": f"Users deleted successfully: {deleted_count} users removed",
+            "deleted_count": deleted_count,
+            "invalid_ids": invalid_ids,
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def parse_user_rows(file: UploadFile):
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig")
+    if (file.filename or "").lower().endswith(".csv"):
+        return list(csv.DictReader(stream))
+    rows = []
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            rows.append(e)
+    return rows
+
+
+def batches(items, size=BULK_WRITE_BATCH):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+# Bulk Create Users
+async def bulk_create_users(file: UploadFile):
+    try:
+        rows = await run_blocking(parse_user_rows, file)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {str(e)}")
+
+    results, pending = [], []
+    for number, row in enumerate(rows, start=1):
+        result = {"row": number, "email": row.get("email") if isinstance(row, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(row, dict):
+                raise ValueError(f"Invalid row: {row}")
+            user = UserCreate(**row)
+            RoleUpdate(role=user.role)
+            pending.append((result, user))
+        except (ValidationError, ValueError) as e:
+            result.update({"status": "error", "error": str(e)})
+
+    created_at = int(datetime.timestamp(datetime.now()))
+    for batch in batches(pending):
+        hashes = await hash_passwords([user.password for _, user in batch])
+        documents = []
+        for (_, user), hashed_password in zip(batch, hashes):
+            document = user.dict()
+            document.update(
+                {"_id": ObjectId(), "password": hashed_password, "created_at": created_at}
+            )
+            documents.append(document)
+
+        errors = await user_repository.bulk_write([InsertOne(d) for d in documents])
+        for index, ((result, _), document) in enumerate(zip(batch, documents)):
+            error = errors.get(index)
+            if error is None:
+                result.update({"status": "created", "id": str(document["_id"])})
+            elif error.get("code") == 11000:
+                result.update({"status": "error", "error": "User with this email already exists"})
+            else:
+                result.update({"status": "error", "error": error.get("errmsg", "Write failed")})
+
+    created = sum(1 for result in results if result.get("status") == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+# Bulk Change Role
+async def bulk_update_roles(updates):
+    results, pending = [], []
+    for number, item in enumerate(updates, start=1):
+        result = {"row": number, "user_id": item.user_id}
+        results.append(result)
+        if not ObjectId.is_valid(item.user_id):
+            result.update({"status": "error", "error": "Invalid user id"})
+        elif item.role not in ALLOWED_ROLES:
+            result.update({"status": "error", "error": f"Role must be one of {ALLOWED_ROLES}"})
+        else:
+            pending.append((result, ObjectId(item.user_id), item.role))
+
+    try:
+        for batch in batches(pending):
+            errors = await user_repository.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": object_id},
+                        {"$set": {"role": role}, "$inc": {"token_version": 1}},
+                    )
+                    for _, object_id, role in batch
+                ]
+            )
+            versions = await user_repository.token_versions(
+                [object_id for _, object_id, _ in batch]
+            )
+            for index, (result, object_id, _) in enumerate(batch):
+                if index in errors:
+                    result.update({"status": "error", "error": errors[index].get("errmsg", "Write failed")})
+                elif object_id not in versions:
+                    result.update({"status": "error", "error": "User not found"})
+                else:
+                    result["status"] = "updated"
+                    user_cache.invalidate(object_id)
+                    token_revocations.revoke(object_id, versions[object_id])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    updated = sum(1 for result in results if result.get("status") == "updated")
+    return {"updated": updated, "failed": len(results) - updated, "results": results}
+
+
 # Change Role
 async def update_role(user_id, role_data):
     try:
         if hasattr(role_data, "dict"):
             role_data = role_data.dict()
             
-        object_id = ObjectId(user_id)
-        user = collection.find_one({"_id": object_id})
-        if not user:
+        updated_user = await user_repository.update(
+            user_id, {"$set": role_data, "$inc": {"token_version": 1}}
+        )
+        if not updated_user:
             raise HTTPException(status_code=404, detail="User not found")
-            
-        collection.update_one({"_id": object_id}, {"$set": role_data})
+        user_cache.invalidate(user_id)
         
-        updated_user = collection.find_one({"_id": object_id})
+        token_revocations.revoke(user_id, updated_user.get("token_version", 0))
         user_response = individual_user(updated_user)
         
         return JSONResponse(
@@ -47,4 +191,37 @@ async def update_role(user_id, role_data):
             content={"message": "Role updated successfully", "data": user_response},
         )
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Embedding Cache Stats
+# The cache modules pull in numpy and langchain, so they are only imported
+# when asked for; auth-only workers never load them.
+async def get_embedding_cache_stats():
+    from app.services.embedding_cache import get_embedding_cache
+
+    return get_embedding_cache().stats()
+
+
+async def get_response_cache_stats():
+    from app.services.response_cache import response_cache
+
+    return response_cache.stats()
+
+
+async def get_llm_scheduler_stats():
+    from app.services.admission import llm_scheduler
+
+    return llm_scheduler.stats()
+
+
+# Query Plan Audit
+async def get_query_plans():
+    try:
+        report = await audit_queries()
+        return {
+            "flagged": [item["name"] for item in report if item["flagged"]],
+            "queries": report,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
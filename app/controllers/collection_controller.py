@@ -0,0 +1,134 @@
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from app.controllers.document_controller import check_access as check_document_access
+from app.models.schema import CollectionCreate
+from app.services import collections, library
+from app.services.collections import individual_collection
+from app.services.admission import llm_scheduler
+from app.services.llm import vectorstore_chat, vectorstore_chat_stream
+from app.utils.streaming import ndjson_response
+
+
+def check_access(collection, current_user, write=False):
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    if current_user.get("role") == "admin":
+        return collection
+    if collection.get("owner_id") == str(current_user["_id"]):
+        return collection
+    if not write and current_user.get("role", "user") in collection.get("roles", []):
+        return collection
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Access denied. You cannot access this collection",
+    )
+
+
+async def check_documents(document_ids, current_user):
+    for document_id in document_ids:
+        check_document_access(await library.get_document(document_id), current_user)
+
+
+# Create Collection
+async def create_collection(body: CollectionCreate, current_user: dict):
+    await check_documents(body.document_ids, current_user)
+    try:
+        collection = await collections.create_collection(
+            body.name, current_user["_id"], body.document_ids, body.roles
+        )
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={
+                "message": "Collection created successfully",
+                "collection_id": str(collection["_id"]),
+                "data": individual_collection(collection),
+            },
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Read Collections
+async def get_collections(current_user: dict):
+    try:
+        return [
+            individual_collection(c) for c in await collections.list_collections(current_user)
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Read Collection
+async def get_collection(collection_id: str, current_user: dict):
+    collection = check_access(await collections.get_collection(collection_id), current_user)
+    return individual_collection(collection)
+
+
+# Add Documents
+async def add_documents(collection_id: str, document_ids: list, current_user: dict):
+    check_access(await collections.get_collection(collection_id), current_user, write=True)
+    await check_documents(document_ids, current_user)
+    collection = await collections.add_documents(collection_id, document_ids)
+    return individual_collection(collection)
+
+
+# Remove Document
+async def remove_document(collection_id: str, document_id: str, current_user: dict):
+    check_access(await collections.get_collection(collection_id), current_user, write=True)
+    collection = await collections.remove_document(collection_id, document_id)
+    return individual_collection(collection)
+
+
+# Query Collection
+async def query_collection(
+    collection_id: str,
+    message: str,
+    current_user: dict,
+    stream: bool = False,
+    session_id: str = "default",
+    cache: bool = True,
+):
+    collection = check_access(await collections.get_collection(collection_id), current_user)
+    user_id = str(current_user["_id"])
+    async with llm_scheduler.admission(current_user) as admission:
+        try:
+            retriever = await collections.open_collection(collection, current_user)
+            if stream:
+                return ndjson_response(
+                    vectorstore_chat_stream(
+                        retriever, message, user_id, session_id, collection["name"],
+                        retriever.cache_id, cache,
+                    ),
+                    on_close=admission.hand_off(),
+                )
+            result = await vectorstore_chat(
+                retriever, message, user_id, session_id, retriever.cache_id, cache
+            )
+            return {
+                "response": result["response"],
+                "usage": result["usage"],
+                "cache": result["cache"],
+                "user": current_user["full_name"],
+                "collection": collection["name"],
+                "collection_id": collection_id,
+                "documents": len(retriever.shards),
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error processing request: {str(e)}"
+            )
+
+
+# Delete Collection
+async def delete_collection(collection_id: str, current_user: dict):
+    check_access(await collections.get_collection(collection_id), current_user, write=True)
+    try:
+        await collections.delete_collection(collection_id)
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"message": "Collection deleted successfully"},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
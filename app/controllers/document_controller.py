@@ -0,0 +1,105 @@
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from app.services import library
+from app.services.library import individual_document
+from app.services.admission import llm_scheduler
+from app.services.llm import vectorstore_chat, vectorstore_chat_stream
+from app.utils.streaming import ndjson_response
+from app.utils.uploads import stored_upload
+
+
+def check_access(document, current_user):
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if current_user.get("role") == "admin":
+        return document
+    if document.get("owner_id") != str(current_user["_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. You do not own this document",
+        )
+    return document
+
+
+# Upload Document
+async def upload_document(file: UploadFile, current_user: dict):
+    try:
+        async with stored_upload(file) as upload:
+            document = await library.create_document(upload, current_user["_id"])
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={
+                "message": "Document uploaded successfully",
+                "document_id": str(document["_id"]),
+                "data": individual_document(document),
+            },
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error processing document: {str(e)}"
+        )
+
+
+# Read Documents
+async def get_documents(current_user: dict):
+    try:
+        owner_id = None if current_user.get("role") == "admin" else current_user["_id"]
+        return [individual_document(d) for d in await library.list_documents(owner_id)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Query Document
+async def query_document(
+    document_id: str,
+    message: str,
+    current_user: dict,
+    stream: bool = False,
+    session_id: str = "default",
+    cache: bool = True,
+):
+    document = check_access(await library.get_document(document_id), current_user)
+    user_id = str(current_user["_id"])
+    async with llm_scheduler.admission(current_user) as admission:
+        try:
+            vectorstore = await library.load_vectorstore(document_id)
+            if stream:
+                return ndjson_response(
+                    vectorstore_chat_stream(
+                        vectorstore, message, user_id, session_id, document["filename"],
+                        document_id, cache,
+                    ),
+                    on_close=admission.hand_off(),
+                )
+            result = await vectorstore_chat(
+                vectorstore, message, user_id, session_id, document_id, cache
+            )
+            return {
+                "response": result["response"],
+                "usage": result["usage"],
+                "cache": result["cache"],
+                "user": current_user["full_name"],
+                "document": document["filename"],
+                "document_id": document_id,
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error processing request: {str(e)}"
+            )
+
+
+# Delete Document
+async def delete_document(document_id: str, current_user: dict):
+    check_access(await library.get_document(document_id), current_user)
+    try:
+        await library.delete_document(document_id)
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"message": "Document deleted successfully"},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
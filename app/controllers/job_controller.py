@@ -0,0 +1,82 @@
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from app.services import jobs
+from app.services.jobs import individual_job
+from app.utils.uploads import save_upload, release_upload
+
+
+def check_access(job, current_user):
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.get("role") == "admin":
+        return job
+    if job.get("owner_id") != str(current_user["_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. You do not own this job",
+        )
+    return job
+
+
+def queue_full(e):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many ingest jobs queued, please retry later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+# Submit Ingest Job
+async def submit_job(file: UploadFile, current_user: dict):
+    # Checked before the upload is read, and again when the job is saved.
+    try:
+        await jobs.check_queue(current_user["_id"], current_user.get("role", "user"))
+    except jobs.JobQueueFull as e:
+        raise queue_full(e)
+    upload = await save_upload(file)
+    try:
+        job = await jobs.submit_job(upload, current_user)
+    except jobs.JobQueueFull as e:
+        release_upload(upload["path"])
+        raise queue_full(e)
+    except Exception as e:
+        release_upload(upload["path"])
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "message": "Ingest job submitted",
+            "job_id": str(job["_id"]),
+            "data": individual_job(job),
+        },
+    )
+
+
+# Read Jobs
+async def get_jobs(current_user: dict):
+    try:
+        owner_id = None if current_user.get("role") == "admin" else current_user["_id"]
+        return [individual_job(job) for job in await jobs.list_jobs(owner_id)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Read Job
+async def get_job(job_id: str, current_user: dict):
+    job = check_access(await jobs.get_job(job_id), current_user)
+    return individual_job(job)
+
+
+# Cancel Job
+async def cancel_job(job_id: str, current_user: dict):
+    job = check_access(await jobs.get_job(job_id), current_user)
+    if job.get("status") not in jobs.ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is already {job.get('status')}",
+        )
+    await jobs.cancel_job(job_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"message": "Job cancellation requested"},
+    )
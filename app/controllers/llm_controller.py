@@ -1,41 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from app.services.llm import handle_chat
+from app.services.llm import (
+    handle_chat,
+    handle_chat_stream,
+    vectorstore_chat,
+    vectorstore_chat_stream,
+)
+from app.services import library
+from app.services.admission import llm_scheduler
+from app.utils.streaming import ndjson_response
+from app.utils.uploads import stored_upload
 from app.middleware.authentication import require_auth
-import os
-import uuid
 from typing import Optional
 
 router = APIRouter(prefix="/llm", tags=["llm"])
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 
+@router.post("")
 async def secure_chat(
     message: str = Form(...),
     file: Optional[UploadFile] = File(None),
+    stream: bool = Form(False),
+    session_id: str = Form("default"),
+    cache: bool = Form(True),
     current_user: dict = Depends(require_auth),
 ):
-    file_path = None
-    try:
-        if file:
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-
-        response = handle_chat(file_path, message)
+    user_id = str(current_user["_id"])
+    async with llm_scheduler.admission(current_user) as admission:
+        try:
+            if file:
+                async with stored_upload(file) as upload:
+                    vectorstore = await library.upload_vectorstore(upload)
 
-        return {"response": response, "user": current_user["full_name"]}
+                if stream:
+                    return ndjson_response(
+                        vectorstore_chat_stream(
+                            vectorstore, message, user_id, session_id, file.filename,
+                            upload["sha256"], cache,
+                        ),
+                        on_close=admission.hand_off(),
+                    )
+                result = await vectorstore_chat(
+                    vectorstore, message, user_id, session_id, upload["sha256"], cache
+                )
+            else:
+                if stream:
+                    return ndjson_response(
+                        handle_chat_stream(message, user_id, session_id, cache),
+                        on_close=admission.hand_off(),
+                    )
+                result = await handle_chat(None, message, user_id, session_id, cache)
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error processing request: {str(e)}"
-        )
+            return {
+                "response": result["response"],
+                "user": current_user["full_name"],
+                "usage": result["usage"],
+                "cache": result["cache"],
+            }
 
-    finally:
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error processing request: {str(e)}"
+            )
@@ -1,19 +1,34 @@
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi import Response
-from app.config.db_config import collection
+from app.repositories import user_repository
 from app.utils.tokens import send_token
 from app.models.schema import UserCreate, UserUpdate, UserLogin, UserResponse
 from app.models.schema import individual_user
-import bcrypt
-from bson import ObjectId
+from app.services.user_cache import user_cache
+from app.services.token_revocation import token_revocations
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from app.utils.passwords import (
+    PasswordPoolBusy,
+    hash_password_async,
+    verify_password,
+    needs_rehash,
+    rehash_in_background,
+)
+
+
+def email_conflict():
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="User with this email already exists",
+    )
 
 
 # Read User
 async def read_user(user_id: str):
     try:
-        object_id = ObjectId(user_id)
-        user = collection.find_one({"_id": object_id})
+        user = await user_repository.find_by_id(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return individual_user(user)
@@ -34,21 +49,19 @@ async def create_user(data: UserCreate):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Please provide all required fields",
             )
-        existing_user = collection.find_one({"email": email})
+        # Cheap indexed check that spares a bcrypt hash; the unique index
+        # still settles concurrent sign-ups below.
+        existing_user = await user_repository.find_by_email(email, {"_id": 1})
         if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="User with this email already exists",
-            )
+            raise email_conflict()
 
         user_data = data.dict()
 
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
+        hashed_password = await hash_password_async(password)
 
         user_data["password"] = hashed_password
-        result = collection.insert_one(user_data)
-        created_user = collection.find_one({"_id": result.inserted_id})
+        user_data["created_at"] = int(datetime.timestamp(datetime.now()))
+        created_user = await user_repository.insert(user_data)
         user_response = individual_user(created_user)
 
         user_response["password"] = None
@@ -56,6 +69,10 @@ async def create_user(data: UserCreate):
             status_code=status.HTTP_201_CREATED,
             content={"message": "User created successfully", "data": user_response},
         )
+    except (HTTPException, PasswordPoolBusy):
+        raise
+    except DuplicateKeyError:
+        raise email_conflict()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -63,23 +80,24 @@ async def create_user(data: UserCreate):
 # Update User
 async def update_user(user_id: str, data: UserUpdate):
     try:
-        object_id = ObjectId(user_id)
-        existing_user = collection.find_one({"_id": object_id})
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         update_data = {k: v for k, v in data.dict().items() if v is not None}
 
         if "password" in update_data and update_data["password"]:
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(
-                update_data["password"].encode("utf-8"), salt
-            )
+            hashed_password = await hash_password_async(update_data["password"])
             update_data["password"] = hashed_password
 
-        collection.update_one({"_id": object_id}, {"$set": update_data})
+        update = {"$set": update_data}
+        # Role and password changes invalidate outstanding access tokens.
+        revoke = "password" in update_data or "role" in update_data
+        if revoke:
+            update["$inc"] = {"token_version": 1}
 
-        updated_user = collection.find_one({"_id": object_id})
+        updated_user = await user_repository.update(user_id, update)
+        if not updated_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
+        if revoke:
+            token_revocations.revoke(user_id, updated_user.get("token_version", 0))
 
         user_response = individual_user(updated_user)
 
@@ -87,6 +105,10 @@ async def update_user(user_id: str, data: UserUpdate):
             status_code=status.HTTP_200_OK,
             content={"message": "User updated successfully", "data": user_response},
         )
+    except (HTTPException, PasswordPoolBusy):
+        raise
+    except DuplicateKeyError:
+        raise email_conflict()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -94,12 +116,12 @@ async def update_user(user_id: str, data: UserUpdate):
 # Delete User
 async def delete_user(user_id: str):
     try:
-        object_id = ObjectId(user_id)
-        existing_user = collection.find_one({"_id": object_id})
-        if not existing_user:
+        deleted = await user_repository.delete(user_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="User not found")
 
-        collection.delete_one({"_id": object_id})
+        user_cache.invalidate(user_id)
+        token_revocations.revoke(user_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"message": "User deleted successfully"},
@@ -120,22 +142,35 @@ async def login(data: UserLogin, response: Response):
                 detail="Please provide email and password",
             )
 
-        user = collection.find_one({"email": email})
+        user = await user_repository.find_by_email(email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
 
-        if not bcrypt.checkpw(password.encode("utf-8"), user["password"]):
+        if not await verify_password(password, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid password",
             )
 
+        if needs_rehash(user["password"]):
+            async def save_hash(hashed_password, user_id=user["_id"], current=user["password"]):
+                await user_repository.replace_password(user_id, current, hashed_password)
+
+            rehash_in_background(password, save_hash)
+
         user_data = individual_user(user)
 
-        return send_token(user_data, response, status_code=status.HTTP_200_OK)
+        return send_token(
+            user_data,
+            response,
+            status_code=status.HTTP_200_OK,
+            token_version=user.get("token_version", 0),
+        )
+    except PasswordPoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
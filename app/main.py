@@ -1,16 +1,88 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from typing import Union
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.routes.user import router as user_router
 from app.routes.admin import router as admin_router
-from app.controllers.llm_controller import router as llm_router
-from app.routes.rag import router as rag_router
+from app.services.user_cache import user_cache, USER_CACHE_CHANGE_STREAM
+from app.config.db_config import collection
+from app.repositories.indexes import ensure_indexes
+from app.utils.passwords import PasswordPoolBusy, BCRYPT_RETRY_AFTER
+from app.middleware.upload_limit import UploadLimitMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.cancellation import CancellationMiddleware
+from app.routes.metrics import router as metrics_router
+
+# LLM_ENABLED=false runs an auth/admin-only worker: the LLM and RAG routes,
+# and everything they import, are never loaded. LLM_WARMUP=true builds the
+# model clients at startup instead of on the first request.
+LLM_ENABLED = (os.getenv("LLM_ENABLED") or "true") == "true"
+LLM_WARMUP = os.getenv("LLM_WARMUP") == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    if USER_CACHE_CHANGE_STREAM:
+        user_cache.start_change_stream(collection)
+    sweepers = []
+    if LLM_ENABLED:
+        from app.services.conversation import conversation_store
+        from app.services.workers import run_blocking
+
+        from app.services.jobs import fail_stale_jobs, run_stale_sweeper
+
+        await conversation_store.ensure_indexes()
+        await fail_stale_jobs()
+        sweepers = [
+            asyncio.create_task(conversation_store.run_sweeper()),
+            asyncio.create_task(run_stale_sweeper()),
+        ]
+        if LLM_WARMUP:
+            from app.services import llm
+
+            await run_blocking(llm.warm_up)
+    yield
+    for sweeper in sweepers:
+        sweeper.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+# Innermost, so a cancelled request is still timed and size-limited.
+app.add_middleware(CancellationMiddleware)
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": str(BCRYPT_RETRY_AFTER)},
+    )
 
-app = FastAPI()
 
 app.include_router(admin_router)
 app.include_router(user_router)
-app.include_router(llm_router)
-app.include_router(rag_router)
+app.include_router(metrics_router)
+if LLM_ENABLED:
+    from app.controllers.llm_controller import router as llm_router
+    from app.routes.rag import router as rag_router
+    from app.services.admission import AdmissionRejected
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+        detail = "Too many requests" if exc.status_code == 429 else "Server busy, please retry"
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": detail},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    app.include_router(llm_router)
+    app.include_router(rag_router)
 
 
 @app.get("/")
@@ -1,16 +1,31 @@
 from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import APIKeyCookie
 from app.utils.tokens import verify_token, create_access_token, send_token
-from app.config.db_config import collection
+from app.utils.tokens import AUTH_STATELESS, access_token_claims, user_from_claims
+from app.repositories import user_repository
 from typing import Optional
 from app.utils.tokens import ACCESS_TOKEN_SECRET, REFRESH_TOKEN_SECRET
-from bson import ObjectId
+from app.services.user_cache import user_cache
+from app.services.token_revocation import token_revocations
+from app.utils.metrics import metrics
 
 
 oauth2_scheme_access = APIKeyCookie(name="access_token", auto_error=False)
 oauth2_scheme_refresh = APIKeyCookie(name="refresh_token", auto_error=False)
 
 
+async def load_user(user_id, fresh=False):
+    user = None if fresh else user_cache.get(user_id)
+    if user is None:
+        with metrics.timed("auth_user_lookup_seconds", source="db"):
+            user = await user_repository.find_by_id(user_id)
+        if user:
+            user_cache.set(user_id, user)
+    else:
+        metrics.inc("auth_user_cache_hits_total")
+    return user
+
+
 async def get_current_user(
     request: Request,
     response: Response,
@@ -18,27 +33,50 @@ async def get_current_user(
     refresh_token: str = Depends(oauth2_scheme_refresh),
 ) -> Optional[dict]:
 
+    # Resolved once per request, however many dependencies ask for it.
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+    user = await resolve_user(response, access_token, refresh_token)
+    request.state.current_user = user
+    return user
+
+
+async def resolve_user(response, access_token, refresh_token):
     if not access_token and not refresh_token:
         return None
     if access_token:
         payload = verify_token(access_token, ACCESS_TOKEN_SECRET)
         if payload:
             user_id = payload.get("id")
-            try:
-                user = collection.find_one({"_id": ObjectId(user_id)})
-                if user:
-                    return user
-            except:
-                pass
+            if AUTH_STATELESS and "role" in payload:
+                # Revoked tokens fall through to the refresh path, which
+                # re-reads the user and issues claims for the current role.
+                if not token_revocations.is_revoked(user_id, payload.get("tv", 0)):
+                    return user_from_claims(payload)
+            else:
+                try:
+                    user = await load_user(user_id)
+                    if user:
+                        return user
+                except:
+                    pass
 
     if refresh_token:
         payload = verify_token(refresh_token, REFRESH_TOKEN_SECRET)
         if payload:
             user_id = payload.get("id")
             try:
-                user = collection.find_one({"_id": ObjectId(user_id)})
+                user = await load_user(user_id, fresh=AUTH_STATELESS)
                 if user:
-                    new_access_token = create_access_token({"id": str(user["_id"])})
+                    new_access_token = create_access_token(
+                        access_token_claims(
+                            str(user["_id"]),
+                            user.get("role", "user"),
+                            user.get("full_name", ""),
+                            user.get("email", ""),
+                            user.get("token_version", 0),
+                        )
+                    )
 
                     response.set_cookie(
                         key="access_token",
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import re
+
+from app.utils import deadline
+from app.utils.metrics import metrics
+
+# POST routes that run embeddings, retrieval or the model on behalf of a
+# waiting client, with their time budgets. Background jobs are not listed:
+# they outlive the request by design.
+CANCELLABLE_ROUTES = [
+    (re.compile(r"^/llm/?$"), deadline.LLM_DEADLINE_SECONDS),
+    (re.compile(r"^/rag/query/?$"), deadline.LLM_DEADLINE_SECONDS),
+    (re.compile(r"^/rag/(documents|collections)/[^/]+/query/?$"), deadline.LLM_DEADLINE_SECONDS),
+    (re.compile(r"^/rag/documents/?$"), deadline.INGEST_DEADLINE_SECONDS),
+]
+
+
+class CancellationMiddleware:
+    """Stops chat, RAG and ingest requests nobody will receive.
+
+    The handler runs as its own task with a deadline in context (see
+    ``app.utils.deadline``). Once the request body has been read, the only
+    message left from the server is ``http.disconnect``; a watcher waits
+    for it and cancels the handler, so embedding, retrieval, the model
+    call and the conversation write are all abandoned. The handler is also
+    cancelled when its deadline passes, with a ``504`` if nothing has been
+    sent yet.
+    """
+
+    def __init__(self, app, routes=CANCELLABLE_ROUTES):
+        self.app = app
+        self.routes = routes
+
+    def budget(self, scope):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        for pattern, seconds in self.routes:
+            if pattern.match(scope["path"]):
+                return seconds
+        return None
+
+    async def __call__(self, scope, receive, send):
+        budget = self.budget(scope)
+        if budget is None:
+            return await self.app(scope, receive, send)
+
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+        response = {"started": False, "complete": False}
+        reason = None
+
+        async def watched_receive():
+            if body_read.is_set():
+                # The watcher owns the server's receive from here on.
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect" or not message.get("more_body", False):
+                body_read.set()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            return message
+
+        async def watched_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        def cancel(why):
+            nonlocal reason
+            if reason is None and not response["complete"] and not handler.done():
+                reason = why
+                handler.cancel()
+
+        async def watch():
+            await body_read.wait()
+            if not disconnected.is_set():
+                # Servers also report a finished response as a disconnect.
+                await receive()
+                disconnected.set()
+            cancel("disconnect")
+
+        token = deadline.start(budget)
+        try:
+            handler = asyncio.create_task(self.app(scope, watched_receive, watched_send))
+        finally:
+            deadline.reset(token)
+        watcher = asyncio.create_task(watch())
+        timer = asyncio.get_running_loop().call_later(budget, cancel, "deadline")
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if reason is None:
+                raise
+            metrics.inc("requests_cancelled_total", reason=reason)
+            if reason == "deadline" and not response["started"]:
+                await self.timeout(send)
+        finally:
+            timer.cancel()
+            watcher.cancel()
+
+    async def timeout(self, send):
+        body = json.dumps({"detail": deadline.TIMEOUT_DETAIL}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
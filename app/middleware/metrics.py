@@ -0,0 +1,40 @@
+import time
+from app.utils.metrics import metrics
+
+
+class MetricsMiddleware:
+    """Records latency per route template, method and role.
+
+    The route is read from the scope after routing, so ``/user/{user_id}``
+    is one series rather than one per id. The role is the one
+    ``get_current_user`` stored on the request state, or ``anonymous``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            user = (scope.get("state") or {}).get("current_user") or {}
+            labels = {
+                "route": getattr(route, "path", "unmatched"),
+                "method": scope["method"],
+                "role": user.get("role", "anonymous"),
+            }
+            metrics.observe("http_request_seconds", time.perf_counter() - started, **labels)
+            metrics.inc("http_requests_total", status=status, **labels)
@@ -0,0 +1,59 @@
+import json
+from app.utils.uploads import MAX_UPLOAD_BYTES, too_large
+
+# Room for the non-file form fields sent alongside an upload.
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """Rejects oversized multipart bodies before they are spooled to disk.
+
+    Starlette parses the whole form before the endpoint runs, so the limit
+    has to be enforced here: a declared Content-Length is checked up front
+    and chunked bodies are counted as they are received.
+    """
+
+    def __init__(self, app, max_body_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            return await self.reject(send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # FastAPI re-raises HTTPException from body parsing as-is.
+                    raise too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def reject(self, send):
+        body = json.dumps({"detail": too_large().detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
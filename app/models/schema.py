@@ -1,7 +1,9 @@
 from pydantic import BaseModel, EmailStr, validator
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 
+ALLOWED_ROLES = ["user", "admin", "moderator"]
+
 class PyObjectId(ObjectId):
     @classmethod
     def __get_validators__(cls):
@@ -104,9 +106,8 @@ class RoleUpdate(BaseModel):
     
     @validator('role')
     def validate_role(cls, v):
-        allowed_roles = ["user", "admin", "moderator"]  
-        if v not in allowed_roles:
-            raise ValueError(f"Role must be one of {allowed_roles}")
+        if v not in ALLOWED_ROLES:
+            raise ValueError(f"Role must be one of {ALLOWED_ROLES}")
         return v
     
     class Config:
@@ -114,4 +115,43 @@ class RoleUpdate(BaseModel):
             "example": {
                 "role": "admin"
             }
-        }
\ No newline at end of file
+        }
+
+class RoleAssignment(BaseModel):
+    user_id: str
+    role: str
+
+class BulkRoleUpdate(BaseModel):
+    updates: List[RoleAssignment]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "updates": [
+                    {"user_id": "507f1f77bcf86cd799439011", "role": "moderator"}
+                ]
+            }
+        }
+
+class CollectionCreate(BaseModel):
+    name: str
+    document_ids: List[str] = []
+    roles: List[str] = []
+    
+    @validator('roles', each_item=True)
+    def validate_role(cls, v):
+        if v not in ALLOWED_ROLES:
+            raise ValueError(f"Role must be one of {ALLOWED_ROLES}")
+        return v
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Support handbook",
+                "document_ids": ["507f1f77bcf86cd799439011"],
+                "roles": ["moderator"]
+            }
+        }
+
+class CollectionDocuments(BaseModel):
+    document_ids: List[str]
@@ -0,0 +1,56 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.config.db_config import (
+    users_collection,
+    documents_collection,
+    jobs_collection,
+    collections_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    (users_collection, [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("role", ASCENDING), ("_id", ASCENDING)], name="role_id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+    ]),
+    (documents_collection, [
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)], name="owner_created_at"),
+        IndexModel([("sha256", ASCENDING), ("embedding_model", ASCENDING)], name="sha256_model"),
+    ]),
+    (jobs_collection, [
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)], name="owner_created_at"),
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)], name="status_updated_at"),
+    ]),
+    (collections_collection, [
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)], name="owner_created_at"),
+        IndexModel([("roles", ASCENDING), ("created_at", DESCENDING)], name="roles_created_at"),
+        IndexModel([("document_ids", ASCENDING)], name="document_ids"),
+    ]),
+]
+
+
+async def ensure_indexes():
+    missing = []
+    for collection, models in INDEXES:
+        try:
+            await collection.create_indexes(models)
+        except OperationFailure as e:
+            # Typically existing duplicate emails; the app still serves, but
+            # the report below names what could not be built.
+            logger.error("Could not create indexes on %s: %s", collection.name, e)
+
+        existing = await collection.index_information()
+        for model in models:
+            name = model.document["name"]
+            info = existing.get(name)
+            if info is None or info.get("unique", False) != model.document.get("unique", False):
+                missing.append(f"{collection.name}.{name}")
+
+    if missing:
+        logger.error("Missing or mismatched indexes: %s", ", ".join(missing))
+    return missing
@@ -0,0 +1,42 @@
+# Filters and sorts shared by the repositories and services. query_audit
+# builds its shapes from the same functions, so the plans it checks are
+# those of the queries that actually reach MongoDB.
+
+NEWEST_FIRST = [("created_at", -1)]
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+def by_id(object_id):
+    return {"_id": object_id}
+
+
+def by_ids(object_ids):
+    return {"_id": {"$in": list(object_ids)}}
+
+
+def owned_by(owner_id=None):
+    """Everything for ``None`` (admin listings), else one owner's items."""
+    return {} if owner_id is None else {"owner_id": str(owner_id)}
+
+
+def same_content(sha256, embedding_model):
+    return {"sha256": sha256, "embedding_model": embedding_model}
+
+
+def visible_collections(user_id, role):
+    if role == "admin":
+        return {}
+    return {"$or": [{"owner_id": str(user_id)}, {"roles": role}]}
+
+
+def containing_document(document_id):
+    return {"document_ids": str(document_id)}
+
+
+def active_jobs(owner_id):
+    return {"owner_id": str(owner_id), "status": {"$in": list(ACTIVE_JOB_STATUSES)}}
+
+
+def stale_jobs(updated_before):
+    return {"status": {"$in": list(ACTIVE_JOB_STATUSES)}, "updated_at": {"$lt": updated_before}}
@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+from bson import ObjectId
+
+from app.config.db_config import (
+    users_collection,
+    documents_collection,
+    jobs_collection,
+    conversations_collection,
+    collections_collection,
+)
+from app.repositories import queries, user_repository
+
+
+# Every query shape the controllers and services issue, built with the same
+# helpers they use. Values are placeholders: explain() only needs the shape
+# to pick a plan.
+def query_shapes():
+    object_id = ObjectId()
+    # Users stored before created_at was recorded give a None position.
+    pages = {
+        "first_page": None,
+        "next_page": {"_id": object_id, "created_at": 0},
+        "next_page_after_missing": {"_id": object_id, "created_at": None},
+    }
+    shapes = [
+        {"name": "users.by_id", "collection": users_collection, "filter": queries.by_id(object_id)},
+        {"name": "users.by_ids", "collection": users_collection, "filter": queries.by_ids([object_id])},
+        {
+            "name": "users.by_email",
+            "collection": users_collection,
+            "filter": user_repository.by_email("audit@example.com"),
+        },
+    ]
+    listings = {
+        "all": user_repository.listing_filter(),
+        "role": user_repository.listing_filter(role="user"),
+        "email_prefix": user_repository.listing_filter(email_prefix="audit"),
+    }
+    for sort, sort_keys in user_repository.SORT_KEYS.items():
+        for listing, query in listings.items():
+            for page, after in pages.items():
+                if sort == "_id" and page == "next_page_after_missing":
+                    continue
+                shapes.append({
+                    "name": f"users.{listing}.by_{sort.lstrip('_')}.{page}",
+                    "collection": users_collection,
+                    "filter": user_repository.page_query(query, sort, after),
+                    "sort": sort_keys,
+                })
+
+    for name, collection in (
+        ("documents", documents_collection),
+        ("jobs", jobs_collection),
+        ("collections", collections_collection),
+    ):
+        shapes.append(
+            {"name": f"{name}.by_id", "collection": collection, "filter": queries.by_id(object_id)}
+        )
+    shapes += [
+        {
+            "name": "conversations.by_key",
+            "collection": conversations_collection,
+            "filter": queries.by_id("audit:default"),
+        },
+        {
+            "name": "documents.by_ids",
+            "collection": documents_collection,
+            "filter": queries.by_ids([object_id]),
+        },
+        {
+            "name": "documents.by_owner",
+            "collection": documents_collection,
+            "filter": queries.owned_by("audit"),
+            "sort": queries.NEWEST_FIRST,
+        },
+        {
+            "name": "documents.same_content",
+            "collection": documents_collection,
+            "filter": queries.same_content("0" * 64, "audit"),
+        },
+        {
+            "name": "jobs.by_owner",
+            "collection": jobs_collection,
+            "filter": queries.owned_by("audit"),
+            "sort": queries.NEWEST_FIRST,
+        },
+        {
+            "name": "jobs.active",
+            "collection": jobs_collection,
+            "filter": queries.active_jobs("audit"),
+        },
+        {
+            "name": "jobs.stale",
+            "collection": jobs_collection,
+            "filter": queries.stale_jobs(0),
+        },
+        {
+            "name": "collections.visible",
+            "collection": collections_collection,
+            "filter": queries.visible_collections("audit", "user"),
+            "sort": queries.NEWEST_FIRST,
+        },
+        {
+            "name": "collections.by_document",
+            "collection": collections_collection,
+            "filter": queries.containing_document("audit"),
+        },
+    ]
+
+    # Admin listings read the whole collection by design.
+    for name, collection in (
+        ("documents", documents_collection),
+        ("jobs", jobs_collection),
+        ("collections", collections_collection),
+    ):
+        shapes.append({
+            "name": f"{name}.all",
+            "collection": collection,
+            "filter": queries.owned_by(None),
+            "sort": queries.NEWEST_FIRST,
+            "allow_collscan": True,
+        })
+    return shapes
+
+
+def plan_stages(plan):
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("queryPlan", "inputStage"):
+        stages += plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+async def explain_shape(shape):
+    cursor = shape["collection"].find(shape["filter"])
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    explanation = await cursor.explain()
+    stages = plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+    collscan = "COLLSCAN" in stages
+    return {
+        "name": shape["name"],
+        "stages": stages,
+        "collscan": collscan,
+        "flagged": collscan and not shape.get("allow_collscan", False),
+    }
+
+
+async def audit_queries():
+    return [await explain_shape(shape) for shape in query_shapes()]
+
+
+if __name__ == "__main__":
+    report = asyncio.run(audit_queries())
+    print(json.dumps(report, indent=2))
+    raise SystemExit(1 if any(item["flagged"] for item in report) else 0)
@@ -0,0 +1,156 @@
+import base64
+import json
+import re
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.config.db_config import users_collection
+from app.repositories import queries
+
+# Everything a request handler needs about a user, without the hash.
+PUBLIC_PROJECTION = {"password": 0}
+
+
+def to_object_id(user_id):
+    return user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+
+
+async def find_by_id(user_id, projection=PUBLIC_PROJECTION):
+    return await users_collection.find_one(queries.by_id(to_object_id(user_id)), projection)
+
+
+def by_email(email):
+    return {"email": email}
+
+
+async def find_by_email(email, projection=None):
+    return await users_collection.find_one(by_email(email), projection)
+
+
+async def insert(user_data):
+    result = await users_collection.insert_one(user_data)
+    user_data["_id"] = result.inserted_id
+    return user_data
+
+
+async def update(user_id, update, projection=PUBLIC_PROJECTION):
+    return await users_collection.find_one_and_update(
+        queries.by_id(to_object_id(user_id)),
+        update,
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+# Compare-and-set: a password changed since ``current`` was read is kept.
+async def replace_password(user_id, current, password):
+    result = await users_collection.update_one(
+        {**queries.by_id(to_object_id(user_id)), "password": current},
+        {"$set": {"password": password}},
+    )
+    return result.modified_count
+
+
+async def delete(user_id):
+    result = await users_collection.delete_one(queries.by_id(to_object_id(user_id)))
+    return result.deleted_count
+
+
+async def delete_many(user_ids):
+    result = await users_collection.delete_many(
+        queries.by_ids(to_object_id(user_id) for user_id in user_ids)
+    )
+    return result.deleted_count
+
+
+# Fields returned by listings; the password hash is never fetched.
+LISTING_PROJECTION = {"email": 1, "full_name": 1, "role": 1, "created_at": 1}
+
+SORT_KEYS = {
+    "_id": [("_id", ASCENDING)],
+    "created_at": [("created_at", ASCENDING), ("_id", ASCENDING)],
+}
+
+
+def listing_filter(role=None, email_prefix=None):
+    query = {}
+    if role:
+        query["role"] = role
+    if email_prefix:
+        # Anchored, case-sensitive prefixes can be answered from the email index.
+        query["email"] = {"$regex": f"^{re.escape(email_prefix)}"}
+    return query
+
+
+def encode_cursor(user, sort):
+    position = {"_id": str(user["_id"])}
+    if sort == "created_at":
+        # None for users stored before created_at was recorded.
+        position["created_at"] = user.get("created_at")
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    position["_id"] = ObjectId(position["_id"])
+    return position
+
+
+def after_cursor(position, sort):
+    if sort == "created_at":
+        created_at = position["created_at"]
+        # Missing and null values sort before every number, so after one of
+        # them come the remaining ones, then everything that has the field.
+        later = {"$ne": None} if created_at is None else {"$gt": created_at}
+        return {
+            "$or": [
+                {"created_at": later},
+                {"created_at": created_at, "_id": {"$gt": position["_id"]}},
+            ]
+        }
+    return {"_id": {"$gt": position["_id"]}}
+
+
+# The filter for the page after ``position`` (a decoded cursor), or the
+# first page when there is none.
+def page_query(query, sort="_id", position=None):
+    if position is None:
+        return query
+    return {"$and": [query, after_cursor(position, sort)]}
+
+
+async def find_page(query, sort="_id", cursor=None, limit=100):
+    query = page_query(query, sort, decode_cursor(cursor) if cursor else None)
+    users = await (
+        users_collection.find(query, LISTING_PROJECTION)
+        .sort(SORT_KEYS[sort])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    next_cursor = encode_cursor(users[limit - 1], sort) if len(users) > limit else None
+    return users[:limit], next_cursor
+
+
+def iterate(query, sort="_id", batch_size=1000):
+    return (
+        users_collection.find(query, LISTING_PROJECTION)
+        .sort(SORT_KEYS[sort])
+        .batch_size(batch_size)
+    )
+
+
+async def token_versions(object_ids):
+    cursor = users_collection.find(queries.by_ids(object_ids), {"token_version": 1})
+    return {user["_id"]: user.get("token_version", 0) async for user in cursor}
+
+
+# Unordered bulk write that reports failures by operation index instead of
+# raising, so one bad row never aborts the rest of the batch.
+async def bulk_write(operations):
+    try:
+        await users_collection.bulk_write(operations, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {error["index"]: error for error in e.details.get("writeErrors", [])}
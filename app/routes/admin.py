@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, UploadFile, File
 from app.controllers.admin_controller import (
     get_all_users,
+    export_users,
     bulk_delete_users,
     update_role,
+    get_embedding_cache_stats,
+    get_response_cache_stats,
+    get_llm_scheduler_stats,
+    get_query_plans,
+    bulk_create_users,
+    bulk_update_roles,
 )
 from app.middleware.authorization import role_required
 from app.middleware.authentication import require_auth
-from typing import List
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-from app.models.schema import RoleUpdate
+from app.models.schema import RoleUpdate, BulkRoleUpdate
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -19,8 +26,18 @@ class BulkDeleteRequest(BaseModel):
 
 
 @router.get("/users")
-async def admin_get_all_users(current_user=Depends(role_required("admin"))):
-    return await get_all_users()
+async def admin_get_all_users(
+    role: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    sort: Literal["_id", "created_at"] = "_id",
+    format: Literal["json", "ndjson"] = "json",
+    current_user=Depends(role_required("admin")),
+):
+    if format == "ndjson":
+        return await export_users(role, email_prefix, sort)
+    return await get_all_users(role, email_prefix, cursor, limit, sort)
 
 
 @router.post("/users/bulk-delete")
@@ -30,6 +47,20 @@ async def admin_bulk_delete_users(
     return await bulk_delete_users(request.user_ids)
 
 
+@router.post("/users/bulk-create")
+async def admin_bulk_create_users(
+    file: UploadFile = File(...), current_user: dict = Depends(role_required("admin"))
+):
+    return await bulk_create_users(file)
+
+
+@router.put("/users/bulk-role")
+async def admin_bulk_update_roles(
+    request: BulkRoleUpdate, current_user: dict = Depends(role_required("admin"))
+):
+    return await bulk_update_roles(request.updates)
+
+
 @router.put("/users/{user_id}/role")
 async def admin_assign_role(
     user_id: str,
@@ -39,3 +70,29 @@ async def admin_assign_role(
 
     role_dict = role_data.dict()
     return await update_role(user_id, role_dict)
+
+
+@router.get("/embedding-cache")
+async def admin_embedding_cache_stats(
+    current_user: dict = Depends(role_required("admin")),
+):
+    return await get_embedding_cache_stats()
+
+
+@router.get("/response-cache")
+async def admin_response_cache_stats(
+    current_user: dict = Depends(role_required("admin")),
+):
+    return await get_response_cache_stats()
+
+
+@router.get("/llm-scheduler")
+async def admin_llm_scheduler_stats(
+    current_user: dict = Depends(role_required("admin")),
+):
+    return await get_llm_scheduler_stats()
+
+
+@router.get("/diagnostics/query-plans")
+async def admin_query_plans(current_user: dict = Depends(role_required("admin"))):
+    return await get_query_plans()
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.middleware.authorization import role_required
+from app.utils.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(current_user: dict = Depends(role_required("admin"))):
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
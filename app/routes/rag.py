@@ -1,60 +1,214 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import JSONResponse
-from app.services.llm import document_chat, document_loader
+from app.services.llm import (
+    handle_chat,
+    handle_chat_stream,
+    vectorstore_chat,
+    vectorstore_chat_stream,
+)
+from app.services import library
+from app.services.admission import llm_scheduler
+from app.utils.streaming import ndjson_response
+from app.utils.uploads import stored_upload
 from app.middleware.authentication import require_auth
-import os
-import uuid
+from app.controllers.document_controller import (
+    upload_document,
+    get_documents,
+    query_document,
+    delete_document,
+)
+from app.controllers.job_controller import (
+    submit_job,
+    get_jobs,
+    get_job,
+    cancel_job,
+)
+from app.controllers.collection_controller import (
+    create_collection,
+    get_collections,
+    get_collection,
+    add_documents,
+    remove_document,
+    query_collection,
+    delete_collection,
+)
+from app.models.schema import CollectionCreate, CollectionDocuments
 from typing import Optional
 
 router = APIRouter(prefix="/rag", tags=["rag"])
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 
 @router.post("/query")
 async def rag_query(
     message: str = Form(...),
     file: Optional[UploadFile] = File(None),
+    stream: bool = Form(False),
+    session_id: str = Form("default"),
+    cache: bool = Form(True),
+    current_user: dict = Depends(require_auth),
+):
+    user_id = str(current_user["_id"])
+    async with llm_scheduler.admission(current_user) as admission:
+        try:
+
+            if file:
+
+                async with stored_upload(file) as upload:
+                    vectorstore = await library.upload_vectorstore(upload)
+
+                if stream:
+                    return ndjson_response(
+                        vectorstore_chat_stream(
+                            vectorstore, message, user_id, session_id, file.filename,
+                            upload["sha256"], cache,
+                        ),
+                        on_close=admission.hand_off(),
+                    )
+
+                result = await vectorstore_chat(
+                    vectorstore, message, user_id, session_id, upload["sha256"], cache
+                )
+
+                return {
+                    "response": result["response"],
+                    "user": current_user["full_name"],
+                    "document": file.filename,
+                    "usage": result["usage"],
+                    "cache": result["cache"],
+                }
+            else:
+
+                if stream:
+                    return ndjson_response(
+                        handle_chat_stream(message, user_id, session_id, cache),
+                        on_close=admission.hand_off(),
+                    )
+
+                result = await handle_chat(None, message, user_id, session_id, cache)
+
+                return {
+                    "response": result["response"],
+                    "user": current_user["full_name"],
+                    "usage": result["usage"],
+                    "cache": result["cache"],
+                }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error processing request: {str(e)}"
+            )
+
+
+@router.post("/documents")
+async def rag_upload_document(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(require_auth),
+):
+    return await upload_document(file, current_user)
+
+
+@router.get("/documents")
+async def rag_get_documents(current_user: dict = Depends(require_auth)):
+    return await get_documents(current_user)
+
+
+@router.post("/documents/{document_id}/query")
+async def rag_query_document(
+    document_id: str,
+    message: str = Form(...),
+    stream: bool = Form(False),
+    session_id: str = Form("default"),
+    cache: bool = Form(True),
+    current_user: dict = Depends(require_auth),
+):
+    return await query_document(
+        document_id, message, current_user, stream, session_id, cache
+    )
+
+
+@router.delete("/documents/{document_id}")
+async def rag_delete_document(
+    document_id: str, current_user: dict = Depends(require_auth)
+):
+    return await delete_document(document_id, current_user)
+
+
+@router.post("/jobs")
+async def rag_submit_job(
+    file: UploadFile = File(...),
     current_user: dict = Depends(require_auth),
 ):
-    file_path = None
-    try:
+    return await submit_job(file, current_user)
+
 
-        if file:
+@router.get("/jobs")
+async def rag_get_jobs(current_user: dict = Depends(require_auth)):
+    return await get_jobs(current_user)
 
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
 
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
+@router.get("/jobs/{job_id}")
+async def rag_get_job(job_id: str, current_user: dict = Depends(require_auth)):
+    return await get_job(job_id, current_user)
 
-            response = document_chat(file_path, message)
 
-            return {
-                "response": response,
-                "user": current_user["full_name"],
-                "document": file.filename,
-            }
-        else:
+@router.delete("/jobs/{job_id}")
+async def rag_cancel_job(job_id: str, current_user: dict = Depends(require_auth)):
+    return await cancel_job(job_id, current_user)
 
-            from app.services.llm import handle_chat
 
-            response = handle_chat(None, message)
+@router.post("/collections")
+async def rag_create_collection(
+    body: CollectionCreate, current_user: dict = Depends(require_auth)
+):
+    return await create_collection(body, current_user)
+
+
+@router.get("/collections")
+async def rag_get_collections(current_user: dict = Depends(require_auth)):
+    return await get_collections(current_user)
 
-            return {
-                "response": response,
-                "user": current_user["full_name"],
-            }
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error processing request: {str(e)}"
-        )
+@router.get("/collections/{collection_id}")
+async def rag_get_collection(
+    collection_id: str, current_user: dict = Depends(require_auth)
+):
+    return await get_collection(collection_id, current_user)
 
-    finally:
 
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
+@router.post("/collections/{collection_id}/documents")
+async def rag_add_documents(
+    collection_id: str,
+    body: CollectionDocuments,
+    current_user: dict = Depends(require_auth),
+):
+    return await add_documents(collection_id, body.document_ids, current_user)
+
+
+@router.delete("/collections/{collection_id}/documents/{document_id}")
+async def rag_remove_document(
+    collection_id: str, document_id: str, current_user: dict = Depends(require_auth)
+):
+    return await remove_document(collection_id, document_id, current_user)
+
+
+@router.post("/collections/{collection_id}/query")
+async def rag_query_collection(
+    collection_id: str,
+    message: str = Form(...),
+    stream: bool = Form(False),
+    session_id: str = Form("default"),
+    cache: bool = Form(True),
+    current_user: dict = Depends(require_auth),
+):
+    return await query_collection(
+        collection_id, message, current_user, stream, session_id, cache
+    )
+
+
+@router.delete("/collections/{collection_id}")
+async def rag_delete_collection(
+    collection_id: str, current_user: dict = Depends(require_auth)
+):
+    return await delete_collection(collection_id, current_user)
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+
+from app.services.workers import LLM_MAX_CONCURRENCY
+from app.utils import deadline
+from app.utils.metrics import metrics
+
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT") or "512")
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT") or "5")
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER") or "2")
+LLM_BURST = int(os.getenv("LLM_BURST") or "10")
+RATE_LIMIT_USERS = int(os.getenv("LLM_RATE_LIMIT_USERS") or "100000")
+
+# Requests per minute per user; 0 disables the limit for the role.
+LLM_RATES = {
+    "user": float(os.getenv("LLM_RATE_USER") or "20"),
+    "moderator": float(os.getenv("LLM_RATE_MODERATOR") or "60"),
+    "admin": float(os.getenv("LLM_RATE_ADMIN") or "0"),
+}
+
+# Lower runs first.
+PRIORITIES = {"admin": 0, "moderator": 1, "user": 2}
+
+
+class AdmissionRejected(Exception):
+    status_code = 503
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class RateLimited(AdmissionRejected):
+    status_code = 429
+
+
+class SchedulerBusy(AdmissionRejected):
+    status_code = 503
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Admission:
+    """Holds one request's slot for the ``async with`` block. A streamed
+    response outlives the handler, so it takes the release over with
+    ``hand_off()``; releasing twice is harmless."""
+
+    __slots__ = ("scheduler", "user", "released", "handed_off")
+
+    def __init__(self, scheduler, user):
+        self.scheduler = scheduler
+        self.user = user
+        self.released = False
+        self.handed_off = False
+
+    async def __aenter__(self):
+        await self.scheduler.admit(self.user)
+        return self
+
+    async def __aexit__(self, *exc):
+        if not self.handed_off:
+            self.release()
+        return False
+
+    def hand_off(self):
+        self.handed_off = True
+        return self.release
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler.release()
+
+
+class LLMScheduler:
+    """Admission control for LLM requests, per worker process.
+
+    A request first takes a token from its user's bucket (refilled at the
+    role's rate, up to ``burst``), or is refused with 429. It then runs if
+    fewer than ``limit`` requests are in flight; otherwise it waits in a
+    priority queue where admins go before moderators before users, FIFO
+    within a role. A full queue, or a wait longer than ``queue_timeout``,
+    gets 503 instead of a request that would time out anyway.
+    """
+
+    def __init__(self, limit=LLM_MAX_CONCURRENCY, queue_limit=LLM_QUEUE_LIMIT,
+                 queue_timeout=LLM_QUEUE_TIMEOUT, rates=LLM_RATES, burst=LLM_BURST,
+                 users=RATE_LIMIT_USERS):
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.rates = rates
+        self.burst = burst
+        self.users = users
+        self.buckets = OrderedDict()
+        self.queue = []
+        self.order = itertools.count()
+        self.active = 0
+        self.waiting = {role: 0 for role in PRIORITIES}
+
+    def role_of(self, user):
+        role = user.get("role", "user")
+        return role if role in PRIORITIES else "user"
+
+    def rate_limit(self, user_id, role):
+        rate = self.rates.get(role, 0)
+        if rate <= 0:
+            return
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = TokenBucket(rate / 60, self.burst)
+            # Forgetting an idle user only refills their bucket early.
+            if len(self.buckets) > self.users:
+                self.buckets.popitem(last=False)
+        self.buckets.move_to_end(user_id)
+        wait = bucket.take()
+        if wait:
+            metrics.inc("llm_rejected_total", reason="rate_limited", role=role)
+            raise RateLimited(max(1, math.ceil(wait)))
+
+    def admission(self, user):
+        return Admission(self, user)
+
+    async def admit(self, user):
+        role = self.role_of(user)
+        self.rate_limit(str(user["_id"]), role)
+        started = time.perf_counter()
+        await self.acquire(role)
+        metrics.observe("llm_queue_wait_seconds", time.perf_counter() - started, role=role)
+
+    async def acquire(self, role):
+        if self.active < self.limit and not self.depth():
+            self.active += 1
+            return
+        if self.depth() >= self.queue_limit:
+            metrics.inc("llm_rejected_total", reason="queue_full", role=role)
+            raise SchedulerBusy(LLM_RETRY_AFTER)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (PRIORITIES[role], next(self.order), future))
+        self.waiting[role] += 1
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(future), deadline.bounded(self.queue_timeout)
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # The slot was handed over just as the wait ended; pass it on.
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("llm_rejected_total", reason="queue_timeout", role=role)
+                raise SchedulerBusy(LLM_RETRY_AFTER)
+            raise
+        finally:
+            self.waiting[role] -= 1
+
+    def release(self):
+        # The slot goes straight to the highest-priority waiter, so a burst
+        # of new arrivals cannot overtake the queue.
+        while self.queue:
+            _, _, future = heapq.heappop(self.queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def depth(self):
+        return sum(self.waiting.values())
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.active,
+            "queued": dict(self.waiting),
+            "queue_limit": self.queue_limit,
+            "tracked_users": len(self.buckets),
+        }
+
+
+llm_scheduler = LLMScheduler()
+
+metrics.gauge("llm_in_flight", lambda: llm_scheduler.active)
+metrics.gauge("llm_queue_depth", llm_scheduler.depth)
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ReturnDocument
+from langchain_core.documents import Document
+
+from app.config.db_config import collections_collection, documents_collection
+from app.repositories import queries
+from app.services.library import shard_cache
+from app.services.llm import get_embeddings
+from app.services.workers import run_blocking
+from app.utils.metrics import metrics
+
+
+def now():
+    return int(datetime.timestamp(datetime.now()))
+
+
+def individual_collection(collection):
+    return {
+        "id": str(collection["_id"]),
+        "name": collection.get("name", ""),
+        "owner_id": collection.get("owner_id", ""),
+        "document_ids": collection.get("document_ids", []),
+        "roles": collection.get("roles", []),
+        "created_at": collection.get("created_at", 0),
+        "updated_at": collection.get("updated_at", 0),
+    }
+
+
+async def create_collection(name, owner_id, document_ids, roles):
+    collection = {
+        "_id": ObjectId(),
+        "name": name,
+        "owner_id": str(owner_id),
+        "document_ids": list(dict.fromkeys(document_ids)),
+        "roles": list(dict.fromkeys(roles)),
+        "created_at": now(),
+        "updated_at": now(),
+    }
+    await collections_collection.insert_one(collection)
+    return collection
+
+
+async def get_collection(collection_id):
+    if not ObjectId.is_valid(collection_id):
+        return None
+    return await collections_collection.find_one(queries.by_id(ObjectId(collection_id)))
+
+
+async def list_collections(current_user):
+    query = queries.visible_collections(current_user["_id"], current_user.get("role", "user"))
+    return await (
+        collections_collection.find(query).sort(queries.NEWEST_FIRST).to_list(length=None)
+    )
+
+
+async def add_documents(collection_id, document_ids):
+    return await collections_collection.find_one_and_update(
+        queries.by_id(ObjectId(collection_id)),
+        {"$addToSet": {"document_ids": {"$each": document_ids}}, "$set": {"updated_at": now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def remove_document(collection_id, document_id):
+    return await collections_collection.find_one_and_update(
+        queries.by_id(ObjectId(collection_id)),
+        {"$pull": {"document_ids": document_id}, "$set": {"updated_at": now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def delete_collection(collection_id):
+    await collections_collection.delete_one(queries.by_id(ObjectId(collection_id)))
+
+
+# A collection's roles only open up documents owned by the collection's
+# owner, so adding someone else's document never widens who can read it.
+def readable(document, collection, current_user):
+    role = current_user.get("role", "user")
+    if role == "admin" or document.get("owner_id") == str(current_user["_id"]):
+        return True
+    return role in collection.get("roles", []) and document.get("owner_id") == collection.get("owner_id")
+
+
+async def searchable_documents(collection, current_user):
+    ids = [ObjectId(i) for i in collection.get("document_ids", []) if ObjectId.is_valid(i)]
+    documents = await documents_collection.find(
+        queries.by_ids(ids), {"owner_id": 1, "filename": 1}
+    ).to_list(length=None)
+    return [d for d in documents if readable(d, collection, current_user)]
+
+
+def search_shard(vectorstore, query, k):
+    import faiss
+
+    distances, rows = vectorstore.index.search(query, k)
+    if vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        distances = -distances
+    return distances[0], rows[0]
+
+
+def merge_top_k(distances, rows, k):
+    """Merges per-shard results, ``(shards, k)`` arrays ordered nearest
+    first, into the ``k`` nearest ``(shard, row)`` pairs overall."""
+    flat = np.where(rows >= 0, distances, np.inf).ravel()
+    k = min(k, int(np.count_nonzero(np.isfinite(flat))))
+    if k == 0:
+        return []
+    nearest = np.argpartition(flat, k - 1)[:k]
+    nearest = nearest[np.argsort(flat[nearest], kind="stable")]
+    shards, positions = np.divmod(nearest, rows.shape[1])
+    return list(zip(shards.tolist(), rows[shards, positions].tolist()))
+
+
+class CollectionRetriever:
+    """Searches every readable shard of a collection concurrently and merges
+    their results; exposes the vectorstore search methods the chat service
+    uses, so collections and single documents share one chat path.
+    """
+
+    def __init__(self, collection, shards):
+        self.shards = shards
+        ids = ",".join(sorted(str(document["_id"]) for document, _ in shards))
+        # Users who can read the same shards share cached answers.
+        self.cache_id = f"collection:{collection['_id']}:{hashlib.sha256(ids.encode()).hexdigest()}"
+
+    async def asimilarity_search_by_vector(self, vector, k=4):
+        if not self.shards:
+            return []
+        query = np.asarray([vector], dtype=np.float32)
+        with metrics.stage("shard_search"):
+            results = await asyncio.gather(
+                *[run_blocking(search_shard, vectorstore, query, k) for _, vectorstore in self.shards]
+            )
+        distances = np.stack([distance for distance, _ in results])
+        rows = np.stack([row for _, row in results])
+
+        relevant_docs = []
+        for shard, row in merge_top_k(distances, rows, k):
+            document, vectorstore = self.shards[shard]
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+            metadata = dict(doc.metadata, document_id=str(document["_id"]),
+                            filename=document.get("filename", ""))
+            relevant_docs.append(Document(page_content=doc.page_content, metadata=metadata))
+        return relevant_docs
+
+    async def asimilarity_search(self, text, k=4):
+        return await self.asimilarity_search_by_vector(await get_embeddings().aembed_query(text), k)
+
+
+async def open_collection(collection, current_user):
+    documents = await searchable_documents(collection, current_user)
+    vectorstores = await asyncio.gather(*[shard_cache.get(d["_id"]) for d in documents])
+    return CollectionRetriever(collection, list(zip(documents, vectorstores)))
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from app.config.db_config import conversations_collection
+from app.repositories import queries
+
+CONVERSATION_WINDOW = int(os.getenv("CONVERSATION_WINDOW") or "50")
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE") or "1024")
+CONVERSATION_IDLE_SECONDS = int(os.getenv("CONVERSATION_IDLE_SECONDS") or "900")
+CONVERSATION_TTL_DAYS = int(os.getenv("CONVERSATION_TTL_DAYS") or "30")
+
+DEFAULT_SESSION = "default"
+
+
+class ConversationStore:
+    """Bounded chat history per (user id, session id).
+
+    MongoDB is the source of truth, so history survives restarts and is
+    shared by every worker; a TTL index on ``updated_at`` drops abandoned
+    sessions. Messages only leave a session by ``fold``, once they are in
+    the summary; the prompt assembler folds when a session holds more than
+    ``window`` of them.
+
+    Every write increments the session's ``version``. An in-process LRU
+    keeps the hot sessions, and a read only re-fetches the messages when
+    the stored version differs from the cached one, so turns written by
+    another worker are never missed. Idle entries are swept on a schedule.
+    """
+
+    def __init__(self, collection, window, cache_size, idle_seconds):
+        self.collection = collection
+        self.window = window
+        self.cache_size = cache_size
+        self.idle_seconds = idle_seconds
+        self.cache = OrderedDict()
+
+    @staticmethod
+    def key(user_id, session_id):
+        return f"{user_id}:{session_id or DEFAULT_SESSION}"
+
+    def _cache_get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        entry["last_used"] = time.monotonic()
+        self.cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key, entry):
+        entry["last_used"] = time.monotonic()
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _cache_update(self, key, version, change):
+        """Applies a write this process made to the cached copy, or drops
+        the copy if the write was not the next version after it."""
+        entry = self.cache.get(key)
+        if entry is None:
+            return
+        if entry["version"] + 1 == version:
+            change(entry)
+            entry["version"] = version
+        else:
+            del self.cache[key]
+
+    async def load(self, user_id, session_id):
+        key = self.key(user_id, session_id)
+        entry = self._cache_get(key)
+        if entry is not None:
+            stored = await self.collection.find_one(queries.by_id(key), {"version": 1})
+            if (stored or {}).get("version", 0) == entry["version"]:
+                return entry
+        doc = await self.collection.find_one(queries.by_id(key)) or {}
+        entry = {
+            "messages": doc.get("messages", []),
+            "summary": doc.get("summary", ""),
+            "version": doc.get("version", 0),
+        }
+        self._cache_put(key, entry)
+        return entry
+
+    async def get_messages(self, user_id, session_id):
+        entry = await self.load(user_id, session_id)
+        return list(entry["messages"])
+
+    async def get_state(self, user_id, session_id):
+        entry = await self.load(user_id, session_id)
+        return {"messages": list(entry["messages"]), "summary": entry["summary"]}
+
+    async def append(self, user_id, session_id, user_text, ai_text):
+        key = self.key(user_id, session_id)
+        new_messages = [
+            {"id": uuid.uuid4().hex, "role": "human", "content": user_text},
+            {"id": uuid.uuid4().hex, "role": "ai", "content": ai_text},
+        ]
+        stored = await self.collection.find_one_and_update(
+            queries.by_id(key),
+            {
+                "$push": {"messages": {"$each": new_messages}},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$inc": {"version": 1},
+                "$setOnInsert": {
+                    "user_id": str(user_id),
+                    "session_id": session_id or DEFAULT_SESSION,
+                },
+            },
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        def change(entry):
+            entry["messages"] = entry["messages"] + new_messages
+
+        self._cache_update(key, stored["version"], change)
+
+    # Replace the given messages with a rolling summary. Folded messages are
+    # pulled by id so turns appended concurrently are never lost.
+    async def fold(self, user_id, session_id, message_ids, summary):
+        key = self.key(user_id, session_id)
+        stored = await self.collection.find_one_and_update(
+            queries.by_id(key),
+            {
+                "$pull": {"messages": {"id": {"$in": list(message_ids)}}},
+                "$set": {"summary": summary, "updated_at": datetime.utcnow()},
+                "$inc": {"version": 1},
+            },
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if stored is None:
+            self.cache.pop(key, None)
+            return
+        folded = set(message_ids)
+
+        def change(entry):
+            entry["messages"] = [m for m in entry["messages"] if m.get("id") not in folded]
+            entry["summary"] = summary
+
+        self._cache_update(key, stored["version"], change)
+
+    async def clear(self, user_id, session_id):
+        key = self.key(user_id, session_id)
+        self.cache.pop(key, None)
+        await self.collection.delete_one(queries.by_id(key))
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [key for key, entry in self.cache.items() if entry["last_used"] < cutoff]
+        for key in idle:
+            del self.cache[key]
+        return len(idle)
+
+    async def run_sweeper(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            "updated_at",
+            expireAfterSeconds=CONVERSATION_TTL_DAYS * 24 * 60 * 60,
+        )
+        await self.collection.create_index([("user_id", 1), ("updated_at", -1)])
+
+
+conversation_store = ConversationStore(
+    conversations_collection,
+    CONVERSATION_WINDOW,
+    CONVERSATION_CACHE_SIZE,
+    CONVERSATION_IDLE_SECONDS,
+)
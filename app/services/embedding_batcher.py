@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import random
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_cache import EMBEDDING_BATCH_SIZE
+from app.services.workers import embedding_semaphore
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS") or "5")
+EMBEDDING_RETRIES = int(os.getenv("EMBEDDING_RETRIES") or "3")
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF") or "0.5")
+
+
+class MicroBatcher:
+    """Coalesces concurrent embedding requests into batched backend calls.
+
+    Texts wait at most ``window`` seconds, or until ``max_batch`` are
+    pending, and are then sent in one call. A text that is already pending
+    or in flight shares the existing result instead of being sent again.
+    Failed calls are retried with jittered exponential backoff; backend
+    calls are limited by ``embedding_semaphore``.
+
+    Callers are counted per text. When every caller waiting for a text has
+    been cancelled, a pending text is dropped from its batch, and a batch
+    in flight is cancelled once none of its texts is still wanted.
+    """
+
+    def __init__(self, embed_batch, max_batch=EMBEDDING_BATCH_SIZE,
+                 window=EMBEDDING_BATCH_WINDOW_MS / 1000, retries=EMBEDDING_RETRIES,
+                 backoff=EMBEDDING_RETRY_BACKOFF):
+        self.embed_batch = embed_batch
+        self.max_batch = max_batch
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.pending = OrderedDict()
+        self.in_flight = {}
+        self.waiters = {}
+        self.sending = {}
+        self.timer = None
+        self.tasks = set()
+
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.retried = 0
+        self.abandoned = 0
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        futures = [self.future(text) for text in texts]
+        try:
+            # Shielded: one caller giving up must not fail the others sharing a text.
+            return list(await asyncio.gather(*[asyncio.shield(f) for f in futures]))
+        finally:
+            for text in texts:
+                self.leave(text)
+
+    def future(self, text):
+        self.requests += 1
+        self.waiters[text] = self.waiters.get(text, 0) + 1
+        future = self.pending.get(text) or self.in_flight.get(text)
+        if future is not None:
+            self.deduplicated += 1
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[text] = future
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, OrderedDict()
+        self.in_flight.update(batch)
+        task = asyncio.create_task(self.send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        for text in batch:
+            self.sending[text] = (batch, task)
+
+    def leave(self, text):
+        count = self.waiters[text] - 1
+        if count:
+            self.waiters[text] = count
+            return
+        del self.waiters[text]
+
+        future = self.pending.pop(text, None)
+        if future is not None:
+            future.cancel()
+            self.abandon(1)
+            return
+        batch, task = self.sending.get(text, (None, None))
+        if batch is not None and not any(t in self.waiters for t in batch):
+            # Forget the batch now so a new caller starts a fresh request
+            # rather than joining one that is being cancelled.
+            self.forget(batch)
+            task.cancel()
+            self.abandon(len(batch))
+
+    def abandon(self, count):
+        self.abandoned += count
+        metrics.inc("embedding_abandoned_total", count)
+
+    def forget(self, batch):
+        for text, future in batch.items():
+            if self.in_flight.get(text) is future:
+                del self.in_flight[text]
+            if self.sending.get(text, (None,))[0] is batch:
+                del self.sending[text]
+
+    async def send(self, batch):
+        texts = list(batch)
+        try:
+            vectors = await self.call(texts)
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, vector in zip(batch.values(), vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self.forget(batch)
+
+    async def call(self, texts):
+        self.batches += 1
+        metrics.inc("embedding_texts_total", len(texts))
+        for attempt in range(self.retries + 1):
+            try:
+                async with embedding_semaphore:
+                    with metrics.timed("embedding_batch_seconds"):
+                        return await self.embed_batch(texts)
+            except Exception as e:
+                if attempt == self.retries:
+                    metrics.inc("embedding_failures_total")
+                    raise
+                self.retried += 1
+                metrics.inc("embedding_retries_total")
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                logger.warning("Embedding batch of %d failed (%s); retrying in %.2fs",
+                               len(texts), e, delay)
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "retried": self.retried,
+            "abandoned": self.abandoned,
+            "pending": len(self.pending),
+            "in_flight": len(self.in_flight),
+        }
+
+
+class BatchingEmbeddings(Embeddings):
+    """Routes async embedding calls for any langchain ``Embeddings`` backend
+    through micro-batchers; sync calls go straight to the backend.
+
+    Queries are only batched when ``query_batch`` (an async callable taking
+    a list of texts) is given, because backends may embed queries and
+    documents differently; otherwise each query is its own call.
+    """
+
+    def __init__(self, embeddings: Embeddings, query_batch=None):
+        self.embeddings = embeddings
+        self.documents = MicroBatcher(embeddings.aembed_documents)
+        self.queries = MicroBatcher(query_batch or self.embed_queries)
+
+    async def embed_queries(self, texts):
+        return await asyncio.gather(*[self.embeddings.aembed_query(text) for text in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.documents.embed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.queries.embed([text]))[0]
+
+    def stats(self):
+        return {"documents": self.documents.stats(), "queries": self.queries.stats()}
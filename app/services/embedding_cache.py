@@ -0,0 +1,285 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.services.workers import run_blocking
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR") or "embedding_cache"
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES") or str(256 * 1024 * 1024))
+EMBEDDING_CACHE_HOT_SIZE = int(os.getenv("EMBEDDING_CACHE_HOT_SIZE") or "4096")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE") or "100")
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+# Slots per set. A key can only live in the WAYS slots of the set its hash
+# selects, so a lookup reads at most WAYS rows and needs no index.
+WAYS = 8
+
+
+def key_words(key: str) -> np.ndarray:
+    return np.frombuffer(bytes.fromhex(key), dtype="<u8")
+
+
+class EmbeddingCache:
+    """Two-tier cache of embedding vectors keyed by content hash.
+
+    Cold tier: a set-associative table in a memory-mapped file shared by
+    every worker process. Each row holds the key, a write stamp and the
+    float32 vector; the key's hash picks a set of ``WAYS`` rows, and a full
+    set overwrites its oldest row. There is no separate index to keep in
+    step: a row is only returned if it still carries the requested key, so
+    a slot another process has reused reads as a miss. Writers hold an
+    exclusive ``flock`` and clear a row's key before rewriting it; readers
+    take no lock and check the key again after copying the vector.
+    Hot tier: an in-memory LRU of recently used vectors, per process.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, hot_size: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hot_size = hot_size
+        self.vectors_path = os.path.join(directory, "vectors.bin")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "lock")
+
+        # Serialises this process's writers; flock only excludes other
+        # processes, since threads share the lock file's descriptor.
+        self.lock = threading.Lock()
+        self.hot = OrderedDict()
+        self.dim = None
+        self.sets = 0
+        self.rows = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = open(self.lock_path, "a+")
+        self._load()
+
+    @staticmethod
+    def _dtype(dim: int):
+        return np.dtype([("key", "<u8", (4,)), ("stamp", "<u8"), ("vector", "<f4", (dim,))])
+
+    def _load(self):
+        try:
+            with open(self.meta_path) as f:
+                dim = json.load(f)["dim"]
+            dtype = self._dtype(dim)
+            rows = os.path.getsize(self.vectors_path) // dtype.itemsize
+            sets = rows // WAYS
+            table = np.memmap(
+                self.vectors_path, dtype=dtype, mode="r+", shape=(sets * WAYS,)
+            )
+        except (OSError, ValueError, KeyError):
+            return
+        self.dim = dim
+        self.sets = sets
+        # Assigned last: readers on other threads only look at rows once set.
+        self.rows = table
+
+    def _open(self, dim: int):
+        # Called with the file lock held, so only one process creates the
+        # table; the others find it here.
+        self._load()
+        if self.rows is not None:
+            return
+        sets = max(1, self.max_bytes // (self._dtype(dim).itemsize * WAYS))
+        np.memmap(
+            self.vectors_path, dtype=self._dtype(dim), mode="w+", shape=(sets * WAYS,)
+        ).flush()
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": dim}, f)
+        os.replace(tmp_path, self.meta_path)
+        self._load()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self.hot[key] = vector
+        self.hot.move_to_end(key)
+        while len(self.hot) > self.hot_size:
+            self.hot.popitem(last=False)
+
+    def _slots(self, words: np.ndarray):
+        first = int(words[0] % self.sets) * WAYS
+        return range(first, first + WAYS)
+
+    def _read(self, key: str):
+        rows = self.rows
+        if rows is None:
+            return None
+        words = key_words(key)
+        keys = rows["key"]
+        for slot in self._slots(words):
+            if np.array_equal(keys[slot], words):
+                vector = np.array(rows["vector"][slot])
+                # A writer clears the key first, so a row rewritten while
+                # it was copied no longer matches.
+                if np.array_equal(keys[slot], words):
+                    return vector
+                return None
+        return None
+
+    def _get(self, key: str):
+        vector = self.hot.get(key)
+        if vector is not None:
+            try:
+                self.hot.move_to_end(key)
+            except KeyError:
+                # Dropped by a writer thread since the lookup.
+                pass
+            return vector
+        vector = self._read(key)
+        if vector is not None:
+            self._remember(key, vector)
+        return vector
+
+    def _write(self, key: str, vector: np.ndarray):
+        rows = self.rows
+        words = key_words(key)
+        keys, stamps = rows["key"], rows["stamp"]
+        slots = self._slots(words)
+        slot = next((s for s in slots if np.array_equal(keys[s], words)), None)
+        if slot is None:
+            slot = next((s for s in slots if not keys[s].any()), None)
+        if slot is None:
+            slot = min(slots, key=lambda s: stamps[s])
+            self.evictions += 1
+        keys[slot] = 0
+        rows["vector"][slot] = vector
+        stamps[slot] = time.time_ns()
+        keys[slot] = words
+
+    # Lookups run on the event loop and take no lock; see the class docstring.
+    def get_many(self, keys: List[str]):
+        if self.rows is None:
+            self._load()
+        vectors = [self._get(key) for key in keys]
+        found = sum(1 for v in vectors if v is not None)
+        self.hits += found
+        self.misses += len(keys) - found
+        return vectors
+
+    def put_many(self, items):
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        for key, vector in items:
+            self._remember(key, vector)
+        if not items:
+            return
+        with self.lock:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                if self.rows is None:
+                    self._open(items[0][1].shape[0])
+                for key, vector in items:
+                    # Vectors of another width stay in the hot tier only.
+                    if vector.shape[0] == self.dim:
+                        self._write(key, vector)
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rows = self.rows
+        used = int(np.count_nonzero(rows["key"].any(axis=1))) if rows is not None else 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "hot_entries": len(self.hot),
+            "disk_entries": used,
+            "disk_capacity": self.sets * WAYS,
+            "dim": self.dim,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the backend, in batches."""
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+
+    def _lookup(self, texts: List[str], namespace: str):
+        keys = [cache_key(f"{self.model}:{namespace}", text) for text in texts]
+        vectors = dict(zip(keys, self.cache.get_many(keys)))
+
+        missing = OrderedDict()
+        for key, text in zip(keys, texts):
+            if vectors[key] is None:
+                missing.setdefault(key, text)
+
+        pending = list(missing.items())
+        batches = [
+            pending[start:start + self.batch_size]
+            for start in range(0, len(pending), self.batch_size)
+        ]
+        return keys, vectors, batches
+
+    @staticmethod
+    def _resolve(keys, vectors):
+        return [np.asarray(vectors[key], dtype=np.float32).tolist() for key in keys]
+
+    def _embed(self, texts: List[str], namespace: str, embed_batch):
+        keys, vectors, batches = self._lookup(texts, namespace)
+        for batch in batches:
+            embedded = embed_batch([text for _, text in batch])
+            items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+            self.cache.put_many(items)
+            vectors.update(items)
+        return self._resolve(keys, vectors)
+
+    async def _aembed(self, texts: List[str], namespace: str, embed_batch):
+        keys, vectors, batches = self._lookup(texts, namespace)
+        for batch in batches:
+            embedded = await embed_batch([text for _, text in batch])
+            items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+            await run_blocking(self.cache.put_many, items)
+            vectors.update(items)
+        return self._resolve(keys, vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(
+            [text], "query", lambda batch: [self.embeddings.embed_query(batch[0])]
+        )[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(texts, "document", self.embeddings.aembed_documents)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async def embed_batch(batch):
+            return [await self.embeddings.aembed_query(batch[0])]
+
+        return (await self._aembed([text], "query", embed_batch))[0]
+
+
+_embedding_cache = None
+
+
+# Opened on first use: it creates its directory and reads its index.
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_HOT_SIZE
+        )
+    return _embedding_cache
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM") or "768")
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS") or "0")
+FAKE_CHAT_LATENCY_MS = float(os.getenv("FAKE_CHAT_LATENCY_MS") or "0")
+FAKE_CHAT_TOKENS = int(os.getenv("FAKE_CHAT_TOKENS") or "64")
+# 0 emits every token at once after the latency.
+FAKE_CHAT_TOKENS_PER_S = float(os.getenv("FAKE_CHAT_TOKENS_PER_S") or "0")
+
+WORDS = (
+    "the document states that each record lists a value for the region and "
+    "period while totals are reported per quarter with notes on method"
+).split()
+
+
+def seed_for(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic local embeddings: each text maps to a fixed unit vector
+    seeded from its hash, so equal texts always embed identically. Each
+    call sleeps ``latency_ms`` and is recorded in ``calls`` (batch sizes),
+    which lets tests and benchmarks see how requests were batched."""
+
+    def __init__(self, dim=FAKE_EMBEDDING_DIM, latency_ms=FAKE_EMBEDDING_LATENCY_MS):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.calls = []
+
+    def vector(self, text: str) -> List[float]:
+        vector = np.random.default_rng(seed_for(text)).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(len(texts))
+        time.sleep(self.latency_ms / 1000)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(len(texts))
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [self.vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic local chat model: the answer is ``tokens`` words picked
+    from a seed of the prompt, so the same prompt always gets the same
+    answer. The first token arrives after ``latency_ms`` and the rest at
+    ``tokens_per_s``, which models a remote model's time to first token and
+    generation rate without calling one."""
+
+    latency_ms: float = FAKE_CHAT_LATENCY_MS
+    tokens: int = FAKE_CHAT_TOKENS
+    tokens_per_s: float = FAKE_CHAT_TOKENS_PER_S
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def answer(self, messages) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = random.Random(seed_for(prompt))
+        return [rng.choice(WORDS) + " " for _ in range(self.tokens)]
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0
+
+    def duration(self, tokens) -> float:
+        return self.latency_ms / 1000 + self.token_delay() * max(0, len(tokens) - 1)
+
+    def result(self, tokens):
+        message = AIMessage(content="".join(tokens).strip())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self.answer(messages)
+        time.sleep(self.duration(tokens))
+        return self.result(tokens)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self.answer(messages)
+        await asyncio.sleep(self.duration(tokens))
+        return self.result(tokens)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self.answer(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(self.token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
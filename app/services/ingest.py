@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from langchain_community.document_loaders import TextLoader, CSVLoader, Docx2txtLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+
+from app.services import parsers
+from app.services.workers import run_blocking
+from app.utils import deadline
+from app.utils.metrics import metrics
+
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES") or "2")
+INGEST_PAGE_BATCH = int(os.getenv("INGEST_PAGE_BATCH") or "8")
+INGEST_ROW_BATCH = int(os.getenv("INGEST_ROW_BATCH") or "200")
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH") or "64")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE") or "4")
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+LAZY_LOADERS = {
+    ".txt": TextLoader,
+    ".csv": CSVLoader,
+    ".docx": Docx2txtLoader,
+}
+
+DONE = object()
+
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+_parse_executor = None
+
+
+def parse_executor():
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=INGEST_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_executor
+
+
+def next_batch(iterator, size):
+    return list(islice(iterator, size))
+
+
+# Stage 1: parse pages (PDF, in the process pool) or rows/sections (lazy
+# loaders, in the thread pool) and hand them on in document order.
+async def parse_pdf(file, pages_out):
+    loop = asyncio.get_running_loop()
+    page_count = await run_blocking(parsers.pdf_page_count, file)
+    in_flight = deque()
+    try:
+        for start in range(0, page_count, INGEST_PAGE_BATCH):
+            deadline.check("parse")
+            end = min(start + INGEST_PAGE_BATCH, page_count)
+            in_flight.append(
+                loop.run_in_executor(parse_executor(), parsers.parse_pdf_pages, file, start, end)
+            )
+            if len(in_flight) >= INGEST_PROCESSES:
+                await pages_out.put(to_documents(await in_flight.popleft()))
+        while in_flight:
+            await pages_out.put(to_documents(await in_flight.popleft()))
+    finally:
+        # On cancellation, batches still queued for the process pool are
+        # dropped; one already being parsed runs to completion.
+        for future in in_flight:
+            future.cancel()
+
+
+async def parse_lazy(file, loader_class, pages_out):
+    iterator = loader_class(file).lazy_load()
+    while True:
+        deadline.check("parse")
+        batch = await run_blocking(next_batch, iterator, INGEST_ROW_BATCH)
+        if not batch:
+            return
+        await pages_out.put(batch)
+
+
+def to_documents(pages):
+    return [Document(page_content=text, metadata=metadata) for text, metadata in pages]
+
+
+# Stage timers cover a whole document. Time spent blocked on a full queue
+# is included, so a slow later stage shows up in earlier ones as well.
+async def parse_stage(file, pages_out):
+    try:
+        with metrics.stage("parse"):
+            extension = os.path.splitext(file)[1].lower()
+            if extension == ".pdf":
+                await parse_pdf(file, pages_out)
+            elif extension in LAZY_LOADERS:
+                await parse_lazy(file, LAZY_LOADERS[extension], pages_out)
+            else:
+                raise Exception("Unsupported file format")
+    finally:
+        await pages_out.put(DONE)
+
+
+# Stage 2: split pages into chunks as they arrive.
+async def split_stage(pages_in, chunks_out, progress):
+    chunk_id = 0
+    while True:
+        pages = await pages_in.get()
+        if pages is DONE:
+            await chunks_out.put(DONE)
+            return
+        deadline.check("split")
+        with metrics.stage("split"):
+            chunks = await run_blocking(text_splitter.split_documents, pages)
+        for chunk in chunks:
+            chunk.metadata["chunk_id"] = chunk_id
+            chunk_id += 1
+        progress["pages"] += len(pages)
+        await chunks_out.put(chunks)
+
+
+# Stage 3: embed fixed-size batches and add them to the index incrementally.
+async def embed_stage(chunks_in, embeddings, progress, on_progress):
+    vectorstore = None
+    buffer = []
+
+    async def flush(batch):
+        nonlocal vectorstore
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        deadline.check("embed_documents")
+        with metrics.stage("embed_documents"):
+            vectors = await embeddings.aembed_documents(texts)
+        text_embeddings = list(zip(texts, vectors))
+        with metrics.stage("index_add"):
+            if vectorstore is None:
+                vectorstore = await run_blocking(
+                    FAISS.from_embeddings, text_embeddings, embeddings, metadatas=metadatas
+                )
+            else:
+                await run_blocking(vectorstore.add_embeddings, text_embeddings, metadatas=metadatas)
+        progress["chunks"] += len(batch)
+        if on_progress:
+            on_progress(dict(progress))
+
+    while True:
+        chunks = await chunks_in.get()
+        if chunks is DONE:
+            break
+        buffer.extend(chunks)
+        while len(buffer) >= INGEST_EMBED_BATCH:
+            batch, buffer = buffer[:INGEST_EMBED_BATCH], buffer[INGEST_EMBED_BATCH:]
+            await flush(batch)
+    if buffer:
+        await flush(buffer)
+    return vectorstore
+
+
+async def ingest_document(file, embeddings, on_progress=None):
+    pages = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    chunks = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    progress = {"pages": 0, "chunks": 0}
+
+    tasks = [
+        asyncio.create_task(parse_stage(file, pages)),
+        asyncio.create_task(split_stage(pages, chunks, progress)),
+        asyncio.create_task(embed_stage(chunks, embeddings, progress, on_progress)),
+    ]
+    try:
+        _, _, vectorstore = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if vectorstore is None:
+        raise Exception("No text could be extracted from the document")
+    return vectorstore
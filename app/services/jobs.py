@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.config.db_config import jobs_collection
+from app.repositories import queries
+from app.services import library
+from app.utils.uploads import release_upload
+
+logger = logging.getLogger(__name__)
+
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL") or "1")
+# Jobs a user may have waiting behind their running ones, across workers.
+JOB_QUEUE_LIMIT = int(os.getenv("INGEST_JOB_QUEUE_LIMIT") or "10")
+JOB_RETRY_AFTER = int(os.getenv("INGEST_JOB_RETRY_AFTER") or "30")
+# An active job not updated for this long lost its worker. Must be well
+# above JOB_PROGRESS_INTERVAL, which is how often live jobs are updated.
+JOB_STALE_SECONDS = int(os.getenv("INGEST_JOB_STALE_SECONDS") or "60")
+
+# Jobs running at once per user, by role.
+JOB_QUOTAS = {
+    "user": int(os.getenv("INGEST_JOB_QUOTA_USER") or "2"),
+    "moderator": int(os.getenv("INGEST_JOB_QUOTA_MODERATOR") or "4"),
+    "admin": int(os.getenv("INGEST_JOB_QUOTA_ADMIN") or "8"),
+}
+
+ACTIVE_STATUSES = queries.ACTIVE_JOB_STATUSES
+
+# owner_id -> {"semaphore", "jobs"}; dropped when the owner's last job ends.
+_quotas = {}
+_tasks = {}
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def quota_for(role):
+    return JOB_QUOTAS.get(role, JOB_QUOTAS["user"])
+
+
+def owner_semaphore(owner_id, role):
+    quota = _quotas.get(owner_id)
+    if quota is None:
+        quota = _quotas[owner_id] = {"semaphore": asyncio.Semaphore(quota_for(role)), "jobs": 0}
+    quota["jobs"] += 1
+    return quota["semaphore"]
+
+
+def release_owner(owner_id):
+    quota = _quotas[owner_id]
+    quota["jobs"] -= 1
+    if not quota["jobs"]:
+        del _quotas[owner_id]
+
+
+async def check_queue(owner_id, role):
+    """Refuses a new job once the owner has their quota running and
+    ``JOB_QUEUE_LIMIT`` more waiting, counted in MongoDB so the bound holds
+    across workers."""
+    active = await jobs_collection.count_documents(
+        queries.active_jobs(owner_id)
+    )
+    if active >= quota_for(role) + JOB_QUEUE_LIMIT:
+        raise JobQueueFull(JOB_RETRY_AFTER)
+
+
+def now():
+    return int(datetime.timestamp(datetime.now()))
+
+
+def individual_job(job):
+    return {
+        "id": str(job["_id"]),
+        "owner_id": job.get("owner_id", ""),
+        "filename": job.get("filename", ""),
+        "status": job.get("status", ""),
+        "progress": job.get("progress", {"pages": 0, "chunks": 0}),
+        "document_id": job.get("document_id"),
+        "error": job.get("error"),
+        "created_at": job.get("created_at", 0),
+        "updated_at": job.get("updated_at", 0),
+    }
+
+
+async def update_job(job_id, fields):
+    fields["updated_at"] = now()
+    await jobs_collection.update_one(queries.by_id(job_id), {"$set": fields})
+
+
+async def submit_job(upload, current_user):
+    role = current_user.get("role", "user")
+    await check_queue(current_user["_id"], role)
+    job = {
+        "_id": ObjectId(),
+        "owner_id": str(current_user["_id"]),
+        "role": role,
+        "filename": upload["filename"],
+        "status": "queued",
+        "progress": {"pages": 0, "chunks": 0},
+        "document_id": None,
+        "error": None,
+        "cancel_requested": False,
+        "created_at": now(),
+        "updated_at": now(),
+    }
+    await jobs_collection.insert_one(job)
+    task = asyncio.create_task(run_job(job["_id"], upload, job["owner_id"], role))
+    _tasks[job["_id"]] = task
+    task.add_done_callback(lambda _: _tasks.pop(job["_id"], None))
+    return job
+
+
+# Progress is buffered in memory and flushed on an interval, from submission
+# on, so queued jobs are kept fresh too (see fail_stale_jobs). The same loop
+# notices cancellations requested through another worker.
+async def report_progress(job_id, progress, task):
+    while True:
+        await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+        await update_job(job_id, {"progress": dict(progress)})
+        job = await jobs_collection.find_one(queries.by_id(job_id), {"cancel_requested": 1})
+        if job and job.get("cancel_requested"):
+            task.cancel()
+            return
+
+
+async def run_job(job_id, upload, owner_id, role):
+    progress = {"pages": 0, "chunks": 0}
+    semaphore = owner_semaphore(owner_id, role)
+    reporter = asyncio.create_task(report_progress(job_id, progress, asyncio.current_task()))
+    document = None
+    try:
+        async with semaphore:
+            await update_job(job_id, {"status": "running"})
+            document = await library.create_document(upload, owner_id, progress.update)
+        await update_job(
+            job_id,
+            {
+                "status": "completed",
+                "progress": dict(progress),
+                "document_id": str(document["_id"]),
+            },
+        )
+    except asyncio.CancelledError:
+        # Cancelled after the document was stored: a cancelled job keeps nothing.
+        if document:
+            await library.delete_document(document["_id"])
+        await update_job(job_id, {"status": "cancelled", "progress": dict(progress)})
+    except Exception as e:
+        await update_job(
+            job_id, {"status": "failed", "progress": dict(progress), "error": str(e)}
+        )
+    finally:
+        reporter.cancel()
+        release_owner(owner_id)
+        release_upload(upload["path"])
+
+
+# Jobs run in the worker that accepted them, so an active job whose worker
+# exited (restart, crash, deploy) would otherwise stay active forever.
+async def fail_stale_jobs():
+    result = await jobs_collection.update_many(
+        queries.stale_jobs(now() - JOB_STALE_SECONDS),
+        {
+            "$set": {
+                "status": "failed",
+                "error": "Interrupted by a server restart",
+                "updated_at": now(),
+            }
+        },
+    )
+    if result.modified_count:
+        logger.warning("Marked %d interrupted ingest jobs as failed", result.modified_count)
+    return result.modified_count
+
+
+# Runs in every worker, so jobs orphaned by a dead worker stop counting
+# against their owner's queue without waiting for a restart.
+async def run_stale_sweeper(interval=JOB_STALE_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await fail_stale_jobs()
+        except Exception:
+            logger.exception("Could not fail stale ingest jobs")
+
+
+async def get_job(job_id):
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await jobs_collection.find_one(queries.by_id(ObjectId(job_id)))
+
+
+async def list_jobs(owner_id=None):
+    return await (
+        jobs_collection.find(queries.owned_by(owner_id))
+        .sort(queries.NEWEST_FIRST)
+        .to_list(length=None)
+    )
+
+
+async def cancel_job(job_id):
+    job_id = ObjectId(job_id)
+    await jobs_collection.update_one(
+        {**queries.by_id(job_id), "status": {"$in": list(ACTIVE_STATUSES)}},
+        {"$set": {"cancel_requested": True, "updated_at": now()}},
+    )
+    task = _tasks.get(job_id)
+    if task:
+        task.cancel()
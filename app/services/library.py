@@ -0,0 +1,276 @@
+import asyncio
+import os
+import pickle
+import shutil
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.config.db_config import documents_collection, collections_collection
+from app.repositories import queries
+from app.services.llm import document_loader, get_embeddings, EMBEDDING_MODEL
+from app.services.vector_index import compact, tune
+from app.services.workers import run_blocking
+from app.utils import deadline
+from app.utils.metrics import metrics
+
+DOCUMENT_DIR = os.getenv("DOCUMENT_DIR") or "documents"
+SHARD_CACHE_SIZE = int(os.getenv("SHARD_CACHE_SIZE") or "64")
+
+INDEX_NAME = "index"
+
+
+def index_path(document_id):
+    return os.path.join(DOCUMENT_DIR, str(document_id))
+
+
+def individual_document(document):
+    return {
+        "id": str(document["_id"]),
+        "filename": document.get("filename", ""),
+        "owner_id": document.get("owner_id", ""),
+        "chunks": document.get("chunks", 0),
+        "sha256": document.get("sha256", ""),
+        "size": document.get("size", 0),
+        "embedding_model": document.get("embedding_model", ""),
+        "index_type": document.get("index_type", "flat"),
+        "created_at": document.get("created_at", 0),
+    }
+
+
+# The first stored document with this content and embedding model, if any.
+async def find_ingested(sha256):
+    return await documents_collection.find_one(
+        queries.same_content(sha256, EMBEDDING_MODEL),
+        {"chunks": 1, "index_type": 1},
+    )
+
+
+# Ingest once, persist the FAISS index and its docstore next to each other.
+# Stored documents are re-indexed for their final size; one-off uploads
+# queried once are not worth an IVF training pass and stay flat. Content
+# that is already stored is not parsed or embedded again: the new document
+# gets hard links to the existing index files.
+async def create_document(upload, owner_id, on_progress=None):
+    existing = await find_ingested(upload["sha256"])
+    if existing:
+        document = await save_or_discard(link_document(existing, upload, owner_id))
+        if document:
+            metrics.inc("ingest_deduplicated_total")
+            if on_progress:
+                on_progress({"chunks": document["chunks"]})
+            return document
+
+    vectorstore = await document_loader(upload["path"], on_progress)
+    corpus = await corpus_chunks(owner_id) + vectorstore.index.ntotal
+    deadline.check("index_compact")
+    with metrics.stage("index_compact"):
+        index_type = await run_blocking(compact, vectorstore, corpus)
+    return await save_or_discard(store_document(upload, owner_id, vectorstore, index_type))
+
+
+async def save_or_discard(save):
+    """Saving is short and is finished even if the caller is cancelled, so a
+    cancelled upload never leaves a half-written index behind. The saved
+    document is then deleted before the cancellation goes on: the caller
+    will never report it, so nothing would ever refer to it."""
+    task = asyncio.ensure_future(save)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        try:
+            document = await asyncio.shield(task)
+        except Exception:
+            document = None
+        if document:
+            await delete_document(document["_id"])
+        raise
+
+
+# Chunks across the owner's stored documents, which decides how small
+# documents are compressed (see vector_index.select_type).
+async def corpus_chunks(owner_id):
+    result = await documents_collection.aggregate([
+        {"$match": queries.owned_by(owner_id)},
+        {"$group": {"_id": None, "chunks": {"$sum": "$chunks"}}},
+    ]).to_list(length=1)
+    return result[0]["chunks"] if result else 0
+
+
+async def store_document(upload, owner_id, vectorstore, index_type):
+    document_id = ObjectId()
+    await run_blocking(vectorstore.save_local, index_path(document_id), index_name=INDEX_NAME)
+    return await insert_document(
+        document_id, upload, owner_id, vectorstore.index.ntotal, index_type
+    )
+
+
+def link_tree(source, destination):
+    """Copies a stored index by hard-linking its files. Index files are
+    never modified after they are saved, and deleting either document only
+    removes its own links. Returns False if the source is gone."""
+    if not os.path.isdir(source):
+        return False
+    try:
+        shutil.copytree(source, destination, copy_function=os.link)
+    except OSError:
+        # No hard links here (another filesystem); fall back to a copy.
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination)
+    return True
+
+
+async def link_document(existing, upload, owner_id):
+    document_id = ObjectId()
+    source = index_path(existing["_id"])
+    if not await run_blocking(link_tree, source, index_path(document_id)):
+        return None
+    return await insert_document(
+        document_id, upload, owner_id, existing.get("chunks", 0),
+        existing.get("index_type", "flat"),
+    )
+
+
+async def insert_document(document_id, upload, owner_id, chunks, index_type):
+    path = index_path(document_id)
+    document = {
+        "_id": document_id,
+        "filename": upload["filename"],
+        "owner_id": str(owner_id),
+        "sha256": upload["sha256"],
+        "size": upload["size"],
+        "chunks": chunks,
+        "embedding_model": EMBEDDING_MODEL,
+        "index_type": index_type,
+        "created_at": int(datetime.timestamp(datetime.now())),
+    }
+    try:
+        await documents_collection.insert_one(document)
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return document
+
+
+async def get_document(document_id):
+    if not ObjectId.is_valid(document_id):
+        return None
+    return await documents_collection.find_one(queries.by_id(ObjectId(document_id)))
+
+
+async def list_documents(owner_id=None):
+    return await (
+        documents_collection.find(queries.owned_by(owner_id))
+        .sort(queries.NEWEST_FIRST)
+        .to_list(length=None)
+    )
+
+
+async def delete_document(document_id):
+    await documents_collection.delete_one(queries.by_id(ObjectId(document_id)))
+    await collections_collection.update_many(
+        queries.containing_document(document_id), {"$pull": {"document_ids": str(document_id)}}
+    )
+    shard_cache.evict(document_id)
+    await run_blocking(shutil.rmtree, index_path(document_id), ignore_errors=True)
+
+
+def read_index(file_path):
+    import faiss
+
+    # Flat and IVF indexes can be served straight from the page cache;
+    # fall back to a regular read for index types faiss cannot map.
+    try:
+        index = faiss.read_index(file_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(file_path)
+    return tune(index)
+
+
+def read_vectorstore(document_id):
+    from langchain_community.vectorstores import FAISS
+
+    path = index_path(document_id)
+    index = read_index(os.path.join(path, f"{INDEX_NAME}.faiss"))
+    with open(os.path.join(path, f"{INDEX_NAME}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(get_embeddings(), index, docstore, index_to_docstore_id)
+
+
+class ShardCache:
+    """LRU of loaded per-document vectorstores.
+
+    Hot documents and collections are served without touching disk; evicted
+    indexes are simply dropped, which releases their memory map. Concurrent
+    requests for a shard that is still loading share the same read, and a
+    shard evicted while it loads is served to those requests but not cached.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, document_id):
+        document_id = str(document_id)
+        vectorstore = self.entries.get(document_id)
+        if vectorstore is not None:
+            self.entries.move_to_end(document_id)
+            self.hits += 1
+            return vectorstore
+
+        task = self.loading.get(document_id)
+        if task is None:
+            self.misses += 1
+            task = self.loading[document_id] = asyncio.ensure_future(self.load(document_id))
+        try:
+            vectorstore = await asyncio.shield(task)
+        except Exception:
+            if self.loading.get(document_id) is task:
+                del self.loading[document_id]
+            raise
+
+        # The first request back caches the shard; evict() has dropped the
+        # read from ``loading`` if the document was deleted meanwhile.
+        if self.loading.get(document_id) is task:
+            del self.loading[document_id]
+            self.entries[document_id] = vectorstore
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return vectorstore
+
+    @staticmethod
+    async def load(document_id):
+        with metrics.stage("index_load"):
+            return await run_blocking(read_vectorstore, document_id)
+
+    def evict(self, document_id):
+        self.entries.pop(str(document_id), None)
+        self.loading.pop(str(document_id), None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "loaded": len(self.entries)}
+
+
+shard_cache = ShardCache(SHARD_CACHE_SIZE)
+
+
+async def load_vectorstore(document_id):
+    return await shard_cache.get(document_id)
+
+
+# A one-off upload whose content is already stored is answered from the
+# stored index instead of being ingested for a single question.
+async def upload_vectorstore(upload):
+    existing = await find_ingested(upload["sha256"])
+    if existing:
+        try:
+            return await load_vectorstore(existing["_id"])
+        except (OSError, RuntimeError):
+            # Deleted since the lookup; faiss reports a missing file as a
+            # RuntimeError.
+            pass
+    return await document_loader(upload["path"])
@@ -1,14 +1,21 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, CSVLoader, Docx2txtLoader
 from dotenv import load_dotenv
+import asyncio
 import os
-from langchain_openai import ChatOpenAI
+import time
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from langchain.memory import ConversationBufferMemory
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.output_parsers import StrOutputParser
+from app.services.embedding_cache import CachedEmbeddings, get_embedding_cache
+from app.services.embedding_batcher import BatchingEmbeddings
+from app.services.conversation import conversation_store
+from app.services.prompt import PromptAssembler, count_tokens
+from app.utils import deadline
+from app.utils.metrics import metrics
+from app.services.response_cache import (
+    RESPONSE_CACHE_ENABLED,
+    history_digest,
+    response_cache,
+    scope_for,
+)
 
 
 
@@ -16,45 +23,78 @@ load_dotenv()
 
 GEMINI_API = os.getenv("GEMINI_API")
 
-if GEMINI_API is None:
-    raise Exception("GEMINI_API_KEY is not set")
+# "google" or "fake" (deterministic local vectors and answers, no API calls).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND") or "google"
+CHAT_BACKEND = os.getenv("CHAT_BACKEND") or "google"
+CHAT_MODEL = "fake-chat" if CHAT_BACKEND == "fake" else "gemini-1.5-pro"
 
-llm = ChatGoogleGenerativeAI(temperature=0.7,  model="gemini-1.5-pro",google_api_key=GEMINI_API)
-global_memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+if EMBEDDING_BACKEND == "fake":
+    from app.services.fakes import FAKE_EMBEDDING_DIM
+    EMBEDDING_MODEL = f"fake-{FAKE_EMBEDDING_DIM}"
+else:
+    EMBEDDING_MODEL = "models/text-embedding-004"
 
+# Clients are built on first use (or by warm_up), so importing this module
+# neither needs GEMINI_API nor pays for the Google client libraries.
+_llm = None
+_embeddings = None
+
+
+def gemini_api_key():
+    if GEMINI_API is None:
+        raise Exception("GEMINI_API_KEY is not set")
+    return GEMINI_API
+
+
+def chat_model():
+    global _llm
+    if _llm is None and CHAT_BACKEND == "fake":
+        from app.services.fakes import FakeChatModel
+        _llm = FakeChatModel()
+    if _llm is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        _llm = ChatGoogleGenerativeAI(temperature=0.7,  model=CHAT_MODEL,google_api_key=gemini_api_key())
+    return _llm
+
+
+def embedding_backend():
+    if EMBEDDING_BACKEND == "fake":
+        from app.services.fakes import FakeEmbeddings
+        backend = FakeEmbeddings()
+        return BatchingEmbeddings(backend, backend.aembed_documents)
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    backend = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=gemini_api_key())
+
+    async def embed_queries(texts):
+        return await backend.aembed_documents(texts, task_type="retrieval_query")
+
+    return BatchingEmbeddings(backend, embed_queries)
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = CachedEmbeddings(embedding_backend(), EMBEDDING_MODEL, get_embedding_cache())
+    return _embeddings
+
+
+def warm_up():
+    # Also pays the import of the ingest stack (loaders, splitter, FAISS).
+    import app.services.ingest
+    chat_model()
+    get_embeddings()
+
+
+async def document_loader(file, on_progress=None):
+    from app.services.ingest import ingest_document
 
-def load_content(file):
-    if file.endswith(".pdf"):
-        return PyPDFLoader(file).load()
-    if file.endswith(".txt"):
-        return TextLoader(file).load()
-    if file.endswith(".csv"):
-        return CSVLoader(file).load()
-    if file.endswith(".docx"):
-        return Docx2txtLoader(file).load()
-    else:
-        raise Exception("Unsupported file format")
-    
-def split_embed(data):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splitted_data = text_splitter.split_documents(data)
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GEMINI_API)
-    vectorstore = FAISS.from_documents(splitted_data, embedding=embeddings)
-    return vectorstore
-
-def document_loader(file):
     if file:
-        load_text = load_content(file)
-        return split_embed(load_text)
+        return await ingest_document(file, get_embeddings(), on_progress)
     else:
         raise Exception("No file path provided")
 
-def document_chat(file, text):
-    vectorstore = document_loader(file)
-    relevant_docs = vectorstore.similarity_search(text, k=3)
-    context_text = "\n\n".join([doc.page_content for doc in relevant_docs]) if relevant_docs else ""
-    past_messages = global_memory.chat_memory.messages
-    prompt = ChatPromptTemplate.from_template("""
+DOCUMENT_TEMPLATE = """
     You are a helpful assistant.
     Document content:
     ---
@@ -65,41 +105,230 @@ def document_chat(file, text):
 
     User's question: {question}
     Answer as best you can, referencing both the document content and conversation history.
-    """)
+    """
+
+CHAT_TEMPLATE = """You are a helpful assistant.
+    Current conversation:
+    {history}
+    Human: {input}
+    AI Assistant:"""
+
+SUMMARY_TEMPLATE = """Progressively summarize the lines of conversation provided, adding onto the previous summary.
+    Keep names, facts and decisions; drop pleasantries. Return only the new summary.
+
+    Current summary:
+    {summary}
+
+    New lines of conversation:
+    {lines}
+
+    New summary:"""
+
+DOCUMENT_PROMPT = ChatPromptTemplate.from_template(DOCUMENT_TEMPLATE)
+CHAT_PROMPT = PromptTemplate.from_template(CHAT_TEMPLATE)
+SUMMARY_PROMPT = PromptTemplate.from_template(SUMMARY_TEMPLATE)
 
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({
-        "context": context_text,
-        "history": past_messages,
-        "question": text
-    })
+async def summarize_history(summary, messages):
+    lines = "\n".join(
+        f"{'Human' if m['role'] == 'human' else 'AI'}: {m['content']}" for m in messages
+    )
+    chain = SUMMARY_PROMPT | chat_model() | StrOutputParser()
+    deadline.check("summarize")
+    with metrics.stage("summarize"):
+        return await chain.ainvoke({"summary": summary or "", "lines": lines})
 
-    global_memory.chat_memory.add_user_message(text)
-    global_memory.chat_memory.add_ai_message(response)
+prompt_assembler = PromptAssembler(conversation_store, summarize_history)
 
+# A request cancelled before this point (client gone, deadline passed) never
+# writes its turn. Once started, the write is finished even if the request
+# is cancelled, so MongoDB and the session cache stay in step.
+async def remember(user_id, session_id, text, response):
+    await asyncio.shield(conversation_store.append(user_id, session_id, text, response))
+
+# Chunks retrieved from a collection are prefixed with their document id.
+def chunk_ids(relevant_docs):
+    return [
+        f"{doc.metadata['document_id']}:{doc.metadata.get('chunk_id')}"
+        if "document_id" in doc.metadata else doc.metadata.get("chunk_id")
+        for doc in relevant_docs
+    ]
+
+# The question embedding serves both retrieval and the semantic cache tier,
+# so it is only computed once per question (and usually comes from the
+# embedding cache). Embedding calls are batched and rate limited by the
+# micro-batcher, so callers do not hold embedding_semaphore themselves.
+async def question_vector(text):
+    deadline.check("embed_query")
+    with metrics.stage("embed_query"):
+        return await get_embeddings().aembed_query(text)
+
+async def retrieve(vectorstore, vector):
+    deadline.check("similarity_search")
+    with metrics.stage("similarity_search"):
+        return await vectorstore.asimilarity_search_by_vector(vector, k=3)
+
+def caching(use_cache):
+    return use_cache and RESPONSE_CACHE_ENABLED
+
+def cache_lookup(template, text, user_id, inputs, vector, document_id=None):
+    """Returns ``(response, cache_status, store)``. On a miss ``response`` is
+    None and ``store(response)`` saves the fresh answer in both tiers; without
+    a ``vector`` the cache is off for this request."""
+    if vector is None:
+        return None, "off", None
+    scope = scope_for(user_id, document_id)
+    history = history_digest(inputs["history"])
+    key = response_cache.exact_key(
+        scope, CHAT_MODEL, template, text, inputs.get("context"), history
+    )
+    response = response_cache.get_exact(key)
+    if response is not None:
+        metrics.inc("response_cache_hits_total", tier="exact")
+        return response, "exact", None
+    partition = response_cache.partition(scope, EMBEDDING_MODEL, document_id, history)
+    response = response_cache.get_similar(partition, vector)
+    if response is not None:
+        metrics.inc("response_cache_hits_total", tier="semantic")
+        return response, "semantic", None
+    response_cache.miss()
+
+    def store(response):
+        response_cache.put(key, response, partition, vector)
+
+    return None, "miss", store
+
+def record_tokens(usage, response):
+    metrics.inc("llm_prompt_tokens_total", usage["total"])
+    metrics.inc("llm_response_tokens_total", count_tokens(response))
+
+# Callers run inside an llm_scheduler admission (see app.services.admission),
+# which bounds how many requests reach the model at once.
+async def complete(chain, inputs, usage, store=None):
+    deadline.check("llm")
+    with metrics.stage("llm"):
+        response = await chain.ainvoke(inputs)
+    record_tokens(usage, response)
+    if store:
+        store(response)
     return response
 
-def handle_chat(file, text):
+async def document_inputs(relevant_docs, text, user_id, session_id):
+    deadline.check("prompt")
+    with metrics.stage("prompt"):
+        parts = await prompt_assembler.assemble(
+            DOCUMENT_TEMPLATE, text, user_id, session_id, relevant_docs
+        )
+    inputs = {"context": parts["context"], "history": parts["history"], "question": text}
+    return inputs, parts["usage"]
+
+async def chat_inputs(text, user_id, session_id):
+    deadline.check("prompt")
+    with metrics.stage("prompt"):
+        parts = await prompt_assembler.assemble(CHAT_TEMPLATE, text, user_id, session_id)
+    return {"input": text, "history": parts["history"]}, parts["usage"]
+
+async def document_chat(file, text, user_id, session_id=None, use_cache=True):
+    vectorstore = await document_loader(file)
+    return await vectorstore_chat(
+        vectorstore, text, user_id, session_id, use_cache=use_cache
+    )
+
+async def vectorstore_chat(vectorstore, text, user_id, session_id=None,
+                           document_id=None, use_cache=True):
+    vector = await question_vector(text)
+    relevant_docs = await retrieve(vectorstore, vector)
+    inputs, usage = await document_inputs(relevant_docs, text, user_id, session_id)
+    response, cache, store = cache_lookup(
+        DOCUMENT_TEMPLATE, text, user_id, inputs,
+        vector if caching(use_cache) else None, document_id,
+    )
+    if response is None:
+        chain = DOCUMENT_PROMPT | chat_model() | StrOutputParser()
+        response = await complete(chain, inputs, usage, store)
+
+    await remember(user_id, session_id, text, response)
+
+    return {"response": response, "usage": usage, "cache": cache}
+
+async def handle_chat(file, text, user_id, session_id=None, use_cache=True):
     if file:
-        response = document_chat(file, text)
+        result = await document_chat(file, text, user_id, session_id, use_cache)
         
-        return response
+        return result
     else:
-        prompt = PromptTemplate.from_template(
-            """You are a helpful assistant.
-            Current conversation:
-            {history}
-            Human: {input}
-            AI Assistant:"""
-        )
-        chain = prompt | llm | StrOutputParser()
-        past_messages = global_memory.load_memory_variables({}).get("chat_history", [])
-        
-        response = chain.invoke({"input": text, "history": past_messages})
+        vector = await question_vector(text) if caching(use_cache) else None
+        inputs, usage = await chat_inputs(text, user_id, session_id)
+        response, cache, store = cache_lookup(CHAT_TEMPLATE, text, user_id, inputs, vector)
+        if response is None:
+            chain = CHAT_PROMPT | chat_model() | StrOutputParser()
+            response = await complete(chain, inputs, usage, store)
         
-        global_memory.chat_memory.add_user_message(text)
-        global_memory.chat_memory.add_ai_message(response)
+        await remember(user_id, session_id, text, response)
         
-        return response
+        return {"response": response, "usage": usage, "cache": cache}
+
+# Streaming variants yield event dicts: one "metadata" event, a "token" event
+# per parser chunk and a final "done". The turn is only written to the
+# conversation store once the whole answer has been sent; a client that
+# disconnects mid-stream stops iteration, so its turn is dropped. A cached
+# answer is sent as a single token event.
+async def stream_answer(chain, inputs, text, user_id, session_id, usage,
+                        cached=None, store=None):
+    if cached is not None:
+        yield {"type": "token", "content": cached}
+        await remember(user_id, session_id, text, cached)
+        yield {"type": "done"}
+        return
+
+    parts = []
+    deadline.check("llm")
+    with metrics.stage("llm"):
+        started = time.perf_counter()
+        async for token in chain.astream(inputs):
+            if not parts:
+                metrics.observe("stage_seconds", time.perf_counter() - started,
+                                stage="llm_first_token")
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+    response = "".join(parts)
+    record_tokens(usage, response)
+    if store:
+        store(response)
+    await remember(user_id, session_id, text, response)
+    yield {"type": "done"}
+
+async def vectorstore_chat_stream(vectorstore, text, user_id, session_id=None, document=None,
+                                  document_id=None, use_cache=True):
+    vector = await question_vector(text)
+    relevant_docs = await retrieve(vectorstore, vector)
+    inputs, usage = await document_inputs(relevant_docs, text, user_id, session_id)
+    response, cache, store = cache_lookup(
+        DOCUMENT_TEMPLATE, text, user_id, inputs,
+        vector if caching(use_cache) else None, document_id,
+    )
+    yield {
+        "type": "metadata",
+        "document": document,
+        "chunks": chunk_ids(relevant_docs),
+        "usage": usage,
+        "cache": cache,
+    }
+
+    chain = DOCUMENT_PROMPT | chat_model() | StrOutputParser()
+    async for event in stream_answer(
+        chain, inputs, text, user_id, session_id, usage, response, store
+    ):
+        yield event
 
+async def handle_chat_stream(text, user_id, session_id=None, use_cache=True):
+    vector = await question_vector(text) if caching(use_cache) else None
+    inputs, usage = await chat_inputs(text, user_id, session_id)
+    response, cache, store = cache_lookup(CHAT_TEMPLATE, text, user_id, inputs, vector)
+    yield {"type": "metadata", "document": None, "chunks": [], "usage": usage, "cache": cache}
 
+    chain = CHAT_PROMPT | chat_model() | StrOutputParser()
+    async for event in stream_answer(
+        chain, inputs, text, user_id, session_id, usage, response, store
+    ):
+        yield event
@@ -0,0 +1,15 @@
+# Kept free of langchain imports: these functions run in spawned parser
+# processes, which import this module on start-up.
+from pypdf import PdfReader
+
+
+def pdf_page_count(file):
+    return len(PdfReader(file).pages)
+
+
+def parse_pdf_pages(file, start, end):
+    reader = PdfReader(file)
+    return [
+        (reader.pages[page].extract_text() or "", {"source": file, "page": page})
+        for page in range(start, end)
+    ]
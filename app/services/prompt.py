@@ -0,0 +1,131 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET") or "6000")
+PROMPT_CONTEXT_SHARE = float(os.getenv("PROMPT_CONTEXT_SHARE") or "0.6")
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN") or "4")
+
+# After a fold, recent turns may use at most this share of the history
+# budget and of the store's message window, so the next few turns fit
+# without summarising again.
+SUMMARY_LOW_WATER = 0.5
+
+
+def count_tokens(text):
+    # Character based estimate: exact counting for Gemini is a network call.
+    if not text:
+        return 0
+    return int(len(text) / PROMPT_CHARS_PER_TOKEN) + 1
+
+
+def truncate_to_tokens(text, tokens):
+    return text[: int(max(0, tokens) * PROMPT_CHARS_PER_TOKEN)]
+
+
+def to_message(message):
+    if message["role"] == "human":
+        return HumanMessage(content=message["content"])
+    return AIMessage(content=message["content"])
+
+
+class PromptAssembler:
+    """Fits system prompt, question, retrieved context and history into a
+    token budget, folding the oldest turns into a rolling summary when the
+    history no longer fits.
+
+    ``summarize(summary, messages)`` extends the previous summary with the
+    folded messages; the result is stored with the conversation so it is
+    only recomputed when history overflows again.
+    """
+
+    def __init__(self, store, summarize, budget=PROMPT_TOKEN_BUDGET,
+                 context_share=PROMPT_CONTEXT_SHARE):
+        self.store = store
+        self.summarize = summarize
+        self.budget = budget
+        self.context_share = context_share
+
+    def fit_context(self, relevant_docs, budget):
+        chunks, used = [], 0
+        for doc in relevant_docs:
+            tokens = count_tokens(doc.page_content)
+            if used + tokens > budget:
+                if not chunks:
+                    chunks.append(truncate_to_tokens(doc.page_content, budget))
+                    used = count_tokens(chunks[0])
+                break
+            chunks.append(doc.page_content)
+            used += tokens
+        return "\n\n".join(chunks), used, len(chunks)
+
+    async def fit_history(self, user_id, session_id, budget):
+        state = await self.store.get_state(user_id, session_id)
+        summary, messages = state["summary"], state["messages"]
+        message_tokens = [count_tokens(m["content"]) for m in messages]
+        folded = 0
+
+        over_window = len(messages) > self.store.window
+        if messages and (over_window or count_tokens(summary) + sum(message_tokens) > budget):
+            keep_budget = budget * SUMMARY_LOW_WATER
+            kept, kept_tokens = 0, 0
+            for tokens in reversed(message_tokens):
+                if kept_tokens + tokens > keep_budget:
+                    break
+                kept += 1
+                kept_tokens += tokens
+            kept = min(kept, int(self.store.window * SUMMARY_LOW_WATER))
+            folded = len(messages) - kept
+            to_fold = messages[:folded]
+            summary = await self.summarize(summary, to_fold)
+            await self.store.fold(
+                user_id, session_id, [m["id"] for m in to_fold if "id" in m], summary
+            )
+            messages, message_tokens = messages[folded:], message_tokens[folded:]
+
+        summary_tokens = count_tokens(summary)
+        if summary_tokens > budget:
+            summary = truncate_to_tokens(summary, budget)
+            summary_tokens = count_tokens(summary)
+
+        history = []
+        if summary:
+            history.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        history.extend(to_message(m) for m in messages)
+
+        usage = {
+            "summary": summary_tokens,
+            "history": sum(message_tokens),
+            "messages_used": len(messages),
+            "messages_folded": folded,
+        }
+        return history, usage
+
+    async def assemble(self, template, question, user_id, session_id, relevant_docs=None):
+        system_tokens = count_tokens(template)
+        question_tokens = count_tokens(question)
+        remaining = max(0, self.budget - system_tokens - question_tokens)
+
+        context, context_tokens, chunks_used = "", 0, 0
+        if relevant_docs:
+            context, context_tokens, chunks_used = self.fit_context(
+                relevant_docs, int(remaining * self.context_share)
+            )
+
+        history, usage = await self.fit_history(
+            user_id, session_id, remaining - context_tokens
+        )
+        usage.update(
+            {
+                "budget": self.budget,
+                "system": system_tokens,
+                "question": question_tokens,
+                "context": context_tokens,
+                "chunks_used": chunks_used,
+            }
+        )
+        usage["total"] = (
+            system_tokens + question_tokens + context_tokens
+            + usage["summary"] + usage["history"]
+        )
+        return {"context": context, "history": history, "usage": usage}
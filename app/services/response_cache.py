@@ -0,0 +1,180 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+RESPONSE_CACHE_ENABLED = (os.getenv("RESPONSE_CACHE_ENABLED") or "true") == "true"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS") or "3600")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE") or "2048")
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY") or "0.95")
+# "user" keeps every answer private to the user who asked. "global" shares
+# answers grounded in a document between everyone allowed to query that
+# document; answers without a document always stay per user.
+RESPONSE_CACHE_SCOPE = os.getenv("RESPONSE_CACHE_SCOPE") or "user"
+
+
+def normalize(question):
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def digest(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def history_digest(history):
+    """Digest of the summary and windowed turns the prompt was built with.
+    An answer to "continue" or "why?" depends on them as much as on the
+    question, so it is only reused within the same conversation state."""
+    return digest(*(f"{message.type}:{message.content}" for message in history or ()))
+
+
+def scope_for(user_id, document_id=None):
+    if RESPONSE_CACHE_SCOPE == "global" and document_id:
+        return "global"
+    return f"user:{user_id}"
+
+
+class ResponseCache:
+    """Two-tier TTL + LRU cache of LLM answers.
+
+    The exact tier is keyed by scope, model, prompt template, normalised
+    question and hashes of the retrieved context and the conversation
+    history. The semantic tier stores the question embedding per (scope,
+    model, document, history) partition and
+    answers a lookup whose cosine similarity reaches ``threshold``. Both
+    tiers share one size limit, evicting least recently used first.
+    """
+
+    def __init__(self, ttl, size, threshold):
+        self.ttl = ttl
+        self.size = size
+        self.threshold = threshold
+        self.exact = OrderedDict()
+        self.semantic = OrderedDict()
+        self.partitions = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def exact_key(scope, model, template, question, context, history=""):
+        return digest(
+            scope, model, template, normalize(question), digest(context or ""), history
+        )
+
+    @staticmethod
+    def partition(scope, model, document_id, history=""):
+        return (scope, model, document_id or "", history)
+
+    def _expired(self, entry):
+        return entry["expires"] < time.monotonic()
+
+    def _drop_semantic(self, key):
+        entry = self.semantic.pop(key, None)
+        if entry is not None:
+            keys = self.partitions.get(entry["partition"])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.partitions[entry["partition"]]
+
+    def _evict(self):
+        while len(self.exact) + len(self.semantic) > self.size:
+            oldest_exact = next(iter(self.exact.values()), None)
+            oldest_semantic = next(iter(self.semantic.values()), None)
+            if oldest_semantic is None or (
+                oldest_exact is not None and oldest_exact["used"] <= oldest_semantic["used"]
+            ):
+                self.exact.popitem(last=False)
+            else:
+                self._drop_semantic(next(iter(self.semantic)))
+            self.evictions += 1
+
+    def get_exact(self, key):
+        entry = self.exact.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self.exact[key]
+            self.expirations += 1
+            return None
+        entry["used"] = time.monotonic()
+        self.exact.move_to_end(key)
+        self.exact_hits += 1
+        return entry["response"]
+
+    def get_similar(self, partition, vector):
+        keys = [key for key in self.partitions.get(partition, ()) if key in self.semantic]
+        for key in keys:
+            if self._expired(self.semantic[key]):
+                self._drop_semantic(key)
+                self.expirations += 1
+        keys = [key for key in keys if key in self.semantic]
+        if not keys:
+            return None
+
+        query = unit(vector)
+        matrix = np.stack([self.semantic[key]["vector"] for key in keys])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        key = keys[best]
+        entry = self.semantic[key]
+        entry["used"] = time.monotonic()
+        self.semantic.move_to_end(key)
+        self.semantic_hits += 1
+        return entry["response"]
+
+    def miss(self):
+        self.misses += 1
+
+    def put(self, key, response, partition=None, vector=None):
+        now = time.monotonic()
+        self.exact[key] = {"response": response, "expires": now + self.ttl, "used": now}
+        self.exact.move_to_end(key)
+        if partition is not None and vector is not None:
+            self._drop_semantic(key)
+            self.semantic[key] = {
+                "partition": partition,
+                "vector": unit(vector),
+                "response": response,
+                "expires": now + self.ttl,
+                "used": now,
+            }
+            self.partitions.setdefault(partition, set()).add(key)
+        self._evict()
+
+    def stats(self):
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "scope": RESPONSE_CACHE_SCOPE,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "exact_entries": len(self.exact),
+            "semantic_entries": len(self.semantic),
+        }
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_SIMILARITY
+)
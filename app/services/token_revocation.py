@@ -0,0 +1,47 @@
+import threading
+import time
+
+from app.utils.tokens import ACCESS_TOKEN_EXPIRE_MINUTES
+
+# Token version given to deleted users: every token they hold is revoked.
+DELETED = 2 ** 62
+
+
+class TokenRevocations:
+    """Minimum valid access-token version per user.
+
+    Entries only need to outlive the access tokens issued before the bump,
+    so they are pruned once ACCESS_TOKEN_EXPIRE_MINUTES have passed.
+    """
+
+    def __init__(self, retention_seconds):
+        self.retention = retention_seconds
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def revoke(self, user_id, min_version=DELETED):
+        with self.lock:
+            current = self.versions.get(str(user_id), (0, 0))[0]
+            self.versions[str(user_id)] = (
+                max(current, min_version),
+                time.monotonic() + self.retention,
+            )
+
+    def is_revoked(self, user_id, token_version):
+        with self.lock:
+            entry = self.versions.get(str(user_id))
+            if entry is None:
+                return False
+            if entry[1] < time.monotonic():
+                del self.versions[str(user_id)]
+                return False
+            return token_version < entry[0]
+
+    def prune(self):
+        now = time.monotonic()
+        with self.lock:
+            for user_id in [k for k, v in self.versions.items() if v[1] < now]:
+                del self.versions[user_id]
+
+
+token_revocations = TokenRevocations(ACCESS_TOKEN_EXPIRE_MINUTES * 60)
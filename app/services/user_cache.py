@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.token_revocation import token_revocations
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS") or "30")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE") or "10000")
+USER_CACHE_CHANGE_STREAM = os.getenv("USER_CACHE_CHANGE_STREAM") == "true"
+
+
+class UserCache:
+    """TTL + LRU cache of user documents keyed by id.
+
+    Writes through the user and admin controllers invalidate entries
+    directly; other workers pick up changes (and token revocations in
+    stateless auth mode) through the optional MongoDB change-stream
+    listener, or at the latest when the TTL expires.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[user_id]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, user):
+        user_id = str(user_id)
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+    def watch(self, collection):
+        try:
+            with collection.watch(
+                [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}]
+            ) as stream:
+                for change in stream:
+                    user_id = change["documentKey"]["_id"]
+                    self.invalidate(user_id)
+                    self.revoke_tokens(user_id, change)
+        except Exception as e:
+            # Standalone servers do not support change streams; fall back to TTL.
+            logger.warning("User cache change stream stopped: %s", e)
+            self.clear()
+
+    @staticmethod
+    def revoke_tokens(user_id, change):
+        if change["operationType"] == "delete":
+            token_revocations.revoke(user_id)
+            return
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        if "token_version" in updated:
+            token_revocations.revoke(user_id, updated["token_version"])
+
+    def start_change_stream(self, collection):
+        thread = threading.Thread(
+            target=self.watch, args=(collection,), name="user-cache-watch", daemon=True
+        )
+        thread.start()
+        return thread
+
+
+user_cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_SIZE)
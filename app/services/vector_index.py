@@ -0,0 +1,110 @@
+import math
+import os
+
+import numpy as np
+
+# auto | flat | flat_fp16 | hnsw | ivf_flat | ivf_fp16 | ivf_pq
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE") or "auto"
+# Every document is its own shard and is searched on its own (collections
+# search their shards separately and merge), so the IVF thresholds apply to
+# a document's chunk count: IVF only pays off once a single shard is large.
+# The default sits just above MIN_TRAINED_COUNT, the smallest set IVF-PQ
+# can be trained on.
+VECTOR_INDEX_FLAT_MAX = int(os.getenv("VECTOR_INDEX_FLAT_MAX") or "10000")
+VECTOR_INDEX_PQ_MIN = int(os.getenv("VECTOR_INDEX_PQ_MIN") or "500000")
+# Total chunks an owner keeps before smaller documents are stored with
+# float16 vectors as well, halving their memory at a negligible recall cost.
+VECTOR_INDEX_COMPRESS_MIN = int(os.getenv("VECTOR_INDEX_COMPRESS_MIN") or "200000")
+VECTOR_INDEX_TRAIN_SIZE = int(os.getenv("VECTOR_INDEX_TRAIN_SIZE") or "100000")
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE") or "16")
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH") or "64")
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M") or "32")
+VECTOR_INDEX_PQ_BYTES = int(os.getenv("VECTOR_INDEX_PQ_BYTES") or "64")
+
+# faiss wants ~39 training points per centroid and PQ codebooks have 256
+# centroids, so smaller sets get a flat index even when IVF is configured.
+POINTS_PER_LIST = 39
+MIN_TRAINED_COUNT = POINTS_PER_LIST * 256
+
+
+def select_type(count, corpus=None):
+    """Index type for a document of ``count`` chunks whose owner stores
+    ``corpus`` chunks in all, this document included."""
+    if VECTOR_INDEX_TYPE != "auto":
+        if VECTOR_INDEX_TYPE.startswith("ivf") and count < MIN_TRAINED_COUNT:
+            return "flat"
+        return VECTOR_INDEX_TYPE
+    if count < VECTOR_INDEX_FLAT_MAX:
+        corpus = count if corpus is None else corpus
+        return "flat_fp16" if corpus >= VECTOR_INDEX_COMPRESS_MIN else "flat"
+    if count < VECTOR_INDEX_PQ_MIN:
+        return "ivf_fp16"
+    return "ivf_pq"
+
+
+def list_count(count):
+    return max(1, min(int(4 * math.sqrt(count)), count // POINTS_PER_LIST))
+
+
+def pq_bytes(dim):
+    # Sub-quantizers must divide the dimension.
+    m = min(VECTOR_INDEX_PQ_BYTES, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def factory_string(index_type, count, dim):
+    nlist = list_count(count)
+    specs = {
+        "flat": "Flat",
+        "flat_fp16": "SQfp16",
+        "hnsw": f"HNSW{VECTOR_INDEX_HNSW_M}",
+        "ivf_flat": f"IVF{nlist},Flat",
+        "ivf_fp16": f"IVF{nlist},SQfp16",
+        "ivf_pq": f"IVF{nlist},PQ{pq_bytes(dim)}",
+    }
+    if index_type not in specs:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+    return specs[index_type]
+
+
+def tune(index, nprobe=VECTOR_INDEX_NPROBE, ef_search=VECTOR_INDEX_EF_SEARCH):
+    """Applies search-time parameters; they are not a property of the data,
+    so they are set on every load rather than trusted from the file."""
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def build_index(vectors, spec):
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > VECTOR_INDEX_TRAIN_SIZE:
+            rows = np.random.default_rng(0).choice(len(vectors), VECTOR_INDEX_TRAIN_SIZE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    index.add(vectors)
+    return tune(index)
+
+
+def compact(vectorstore, corpus=None):
+    """Rebuilds the flat index produced by incremental ingest as the index
+    type selected for its final size and returns that type. Rows keep their
+    order, so the docstore mapping stays valid."""
+    flat = vectorstore.index
+    index_type = select_type(flat.ntotal, corpus)
+    if index_type != "flat":
+        spec = factory_string(index_type, flat.ntotal, flat.d)
+        vectorstore.index = build_index(flat.reconstruct_n(0, flat.ntotal), spec)
+    return index_type
@@ -0,0 +1,21 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS") or "4")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY") or "256")
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY") or "16")
+
+# Parsing, splitting, FAISS builds and index/disk I/O run here so they never
+# hold the event loop; the pool size caps how many ingests burn CPU at once.
+ingest_executor = ThreadPoolExecutor(
+    max_workers=INGEST_MAX_WORKERS, thread_name_prefix="ingest"
+)
+
+embedding_semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ingest_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,52 @@
+import contextvars
+import os
+import time
+
+from fastapi import HTTPException, status
+
+from app.utils.metrics import metrics
+
+# Time budgets for a whole request, from the handler starting to the last
+# byte of the response.
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS") or "120")
+INGEST_DEADLINE_SECONDS = float(os.getenv("INGEST_DEADLINE_SECONDS") or "600")
+
+TIMEOUT_DETAIL = "Request took too long"
+
+# Set per request by CancellationMiddleware and inherited by every task the
+# request starts; unset (None) for background jobs and other routes.
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, stage):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=TIMEOUT_DETAIL)
+        self.stage = stage
+
+
+def start(seconds):
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def reset(token):
+    _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left in the current request's budget, or None outside one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check(stage):
+    """Called before a stage starts, so a spent budget stops the request
+    there instead of starting work whose result would arrive too late."""
+    left = remaining()
+    if left is not None and left <= 0:
+        metrics.inc("deadline_exceeded_total", stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+def bounded(timeout):
+    left = remaining()
+    return timeout if left is None else max(0, min(timeout, left))
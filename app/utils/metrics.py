@@ -0,0 +1,143 @@
+import bisect
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+METRICS_ENABLED = (os.getenv("METRICS_ENABLED") or "true") == "true"
+
+# Seconds; wide enough for a cached user lookup and a long Gemini answer.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+class Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Metrics:
+    """In-process counters, gauges and fixed-bucket histograms rendered in
+    the Prometheus text format.
+
+    Recording is a dict update under a lock, cheap enough to leave on in
+    production. Values are per worker process; scrape every worker.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, enabled=METRICS_ENABLED):
+        self.buckets = buckets
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def timed(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def stage(self, stage):
+        return Timer(self, "stage_seconds", {"stage": stage})
+
+    def gauge(self, name, read):
+        """Registers ``read()``, called at scrape time, as a gauge."""
+        self.gauges[name] = read
+
+    def render(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self.histograms.items()}
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (key_name, labels), value in sorted(counters.items()):
+                if key_name == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (key_name, labels), (counts, total, count) in sorted(histograms.items()):
+                if key_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += bucket
+                    lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+        for name, read in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command issued by the clients it is registered on."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.registry.observe(
+            "db_command_seconds", event.duration_micros / 1e6, command=event.command_name
+        )
+
+    def failed(self, event):
+        self.registry.observe(
+            "db_command_seconds", event.duration_micros / 1e6, command=event.command_name
+        )
+        self.registry.inc("db_command_failures_total", command=event.command_name)
+
+
+metrics = Metrics()
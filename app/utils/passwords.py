@@ -0,0 +1,103 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from app.utils.metrics import metrics
+
+# bcrypt releases the GIL while hashing, so threads hash in parallel.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS") or str(os.cpu_count() or 2))
+BCRYPT_QUEUE_LIMIT = int(os.getenv("BCRYPT_QUEUE_LIMIT") or "64")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS") or "12")
+BCRYPT_RETRY_AFTER = int(os.getenv("BCRYPT_RETRY_AFTER") or "1")
+
+password_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Bulk hashing may only hold part of the pool so logins keep flowing.
+bulk_semaphore = asyncio.Semaphore(max(1, BCRYPT_WORKERS // 2))
+
+_pending = 0
+_rehash_tasks = set()
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> bytes:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds))
+
+
+def check_password(password: str, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed)
+
+
+def hash_rounds(hashed: bytes) -> int:
+    # Modular crypt format: $2b$<cost>$<salt+hash>
+    return int(hashed.split(b"$")[2])
+
+
+def needs_rehash(hashed: bytes) -> bool:
+    return hash_rounds(hashed) != BCRYPT_ROUNDS
+
+
+async def run_in_pool(func, *args):
+    if _pending >= BCRYPT_WORKERS + BCRYPT_QUEUE_LIMIT:
+        metrics.inc("bcrypt_shed_total")
+        raise PasswordPoolBusy()
+    return await _run(func, *args)
+
+
+# Everything submitted to the pool is counted in _pending, so the check
+# above sees the pool as busy whoever is hashing.
+async def _run(func, *args):
+    global _pending
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        with metrics.timed("bcrypt_seconds", operation=func.__name__):
+            return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> bytes:
+    return await run_in_pool(hash_password, password)
+
+
+async def verify_password(password: str, hashed: bytes) -> bool:
+    return await run_in_pool(check_password, password, hashed)
+
+
+# Bulk hashes are never shed (bulk_semaphore bounds them instead), but the
+# ones holding a worker count as pending: logins arriving meanwhile get a
+# 503 rather than an unbounded wait behind an import.
+async def hash_passwords(passwords):
+    async def hash_one(password):
+        async with bulk_semaphore:
+            return await _run(hash_password, password)
+
+    return await asyncio.gather(*[hash_one(p) for p in passwords])
+
+
+def rehash_in_background(password: str, save):
+    """Re-encode a hash at the configured cost after a successful login,
+    without adding the extra hash to the login's latency."""
+
+    async def rehash():
+        try:
+            await save(await run_in_pool(hash_password, password))
+        except PasswordPoolBusy:
+            pass
+
+    task = asyncio.create_task(rehash())
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+
+def pool_stats():
+    return {"workers": BCRYPT_WORKERS, "pending": _pending, "queue_limit": BCRYPT_QUEUE_LIMIT}
+
+
+metrics.gauge("bcrypt_pending", lambda: _pending)
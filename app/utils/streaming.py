@@ -0,0 +1,25 @@
+import json
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+
+async def ndjson(events, on_close=None):
+    try:
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "detail": f"Error processing request: {str(e)}"}) + "\n"
+    finally:
+        if on_close:
+            on_close()
+
+
+# on_close runs once the stream ends, is cut short, or (as a background task)
+# if the body was never iterated; it must tolerate being called twice.
+def ndjson_response(events, on_close=None):
+    return StreamingResponse(
+        ndjson(events, on_close),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(on_close) if on_close else None,
+    )
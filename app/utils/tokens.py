@@ -15,6 +15,30 @@ REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS") or "30")
 
 IS_DEVELOPMENT = os.getenv("ENVIRONMENT") == "development"
 
+# Stateless mode: access tokens carry the role and token version so
+# authorization needs no database lookup until the token is refreshed.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS") == "true"
+
+
+def access_token_claims(user_id: str, role: str, full_name: str, email: str,
+                        token_version: int = 0) -> dict:
+    claims = {"id": user_id}
+    if AUTH_STATELESS:
+        claims.update(
+            {"role": role, "name": full_name, "email": email, "tv": token_version}
+        )
+    return claims
+
+
+def user_from_claims(payload: dict) -> dict:
+    return {
+        "_id": payload["id"],
+        "role": payload.get("role", "user"),
+        "full_name": payload.get("name", ""),
+        "email": payload.get("email", ""),
+        "token_version": payload.get("tv", 0),
+    }
+
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -40,9 +64,15 @@ def verify_token(token: str, secret_key: str) -> Dict:
         return None
 
 
-def send_token(user: dict, response: Response, status_code: int = status.HTTP_200_OK):
+def send_token(user: dict, response: Response, status_code: int = status.HTTP_200_OK,
+               token_version: int = 0):
 
-    access_token = create_access_token({"id": user["id"]})
+    access_token = create_access_token(
+        access_token_claims(
+            user["id"], user.get("role", "user"), user.get("full_name", ""),
+            user.get("email", ""), token_version,
+        )
+    )
 
     refresh_token = create_refresh_token({"id": user["id"]})
 
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.services.workers import run_blocking
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or "uploads"
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE") or str(1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES") or str(50 * 1024 * 1024))
+
+def too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes",
+    )
+
+
+def detect_type(head: bytes, filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if head.startswith(b"%PDF-"):
+        return ".pdf"
+    if head.startswith(b"PK\x03\x04") and extension == ".docx":
+        return ".docx"
+    if head and b"\x00" not in head and extension in (".txt", ".csv"):
+        return extension
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Unsupported file format",
+    )
+
+
+def copy_upload(source, filename: str) -> dict:
+    """Copies an upload to its own file in ``UPLOAD_DIR`` in fixed-size
+    chunks, hashing it and detecting its type in the same pass. Runs on a
+    worker thread. Each request gets a private file, so no worker can delete
+    a file another worker is still reading; identical content is shared at
+    the document level instead (see ``library.create_document``)."""
+    digest = hashlib.sha256()
+    size = 0
+    file_type = None
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    name = uuid.uuid4().hex
+    tmp_path = os.path.join(UPLOAD_DIR, f".{name}.part")
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if file_type is None:
+                    file_type = detect_type(chunk[:8], filename)
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise too_large()
+                digest.update(chunk)
+                f.write(chunk)
+        if file_type is None:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        file_path = os.path.join(UPLOAD_DIR, f"{name}{file_type}")
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+    return {
+        "path": file_path,
+        "filename": filename,
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "type": file_type,
+    }
+
+
+def discard(file_path: str):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(file: UploadFile) -> dict:
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise too_large()
+
+    copying = asyncio.ensure_future(run_blocking(copy_upload, file.file, file.filename))
+    try:
+        return await asyncio.shield(copying)
+    except asyncio.CancelledError:
+        # The thread cannot be interrupted; remove its file once it is done.
+        copying.add_done_callback(release_finished)
+        raise
+
+
+def release_finished(copying):
+    if not copying.cancelled() and copying.exception() is None:
+        discard(copying.result()["path"])
+
+
+def release_upload(file_path: str):
+    discard(file_path)
+
+
+@asynccontextmanager
+async def stored_upload(file: UploadFile):
+    upload = await save_upload(file)
+    try:
+        yield upload
+    finally:
+        release_upload(upload["path"])
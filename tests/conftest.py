@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from app.benchmarks.suite import configure
+
+# Settings are read at import, so the app is pointed at the in-process
+# MongoDB stand-in and fake models before any test imports it.
+WORKDIR = tempfile.mkdtemp(prefix="tests-")
+configure(WORKDIR)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+PASSWORD = "test-password"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    from app.config import db_config
+
+    collections = [
+        db_config.users_collection,
+        db_config.documents_collection,
+        db_config.conversations_collection,
+        db_config.jobs_collection,
+        db_config.collections_collection,
+    ]
+    for collection in collections:
+        await collection.drop()
+    yield db_config
+    for collection in collections:
+        await collection.drop()
+
+
+@pytest.fixture
+async def app(db):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    import httpx
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def login(client, email, role="user"):
+    from app.utils.passwords import hash_password
+    from app.config.db_config import users_collection
+
+    await users_collection.insert_one({
+        "email": email,
+        "password": hash_password(PASSWORD),
+        "full_name": email.split("@")[0],
+        "role": role,
+        "created_at": 0,
+    })
+    response = await client.post("/login/", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    client.cookies.set("access_token", response.json()["access_token"])
+    return client
+
+
+@pytest.fixture
+async def admin(client):
+    return await login(client, "admin@test.example.com", role="admin")
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+pytestmark = pytest.mark.anyio
+
+
+def csv_upload(rows):
+    lines = ["email,password,full_name,role"] + [",".join(row) for row in rows]
+    return {"file": ("users.csv", "\n".join(lines).encode("utf-8"))}
+
+
+async def test_bulk_create_reports_each_row(admin, db):
+    await db.users_collection.insert_one({"email": "taken@test.example.com"})
+
+    response = await admin.post("/admin/users/bulk-create", files=csv_upload([
+        ("new1@test.example.com", "secret", "New One", "user"),
+        ("taken@test.example.com", "secret", "Taken", "user"),
+        ("not-an-email", "secret", "Bad Email", "user"),
+        ("new2@test.example.com", "secret", "New Two", "superuser"),
+        ("new1@test.example.com", "secret", "New One Again", "user"),
+        ("new3@test.example.com", "secret", "New Three", "moderator"),
+    ]))
+
+    assert response.status_code == 200
+    body = response.json()
+    statuses = [result["status"] for result in body["results"]]
+    assert statuses == ["created", "error", "error", "error", "error", "created"]
+    assert body["results"][1]["error"] == "User with this email already exists"
+    assert body["results"][4]["error"] == "User with this email already exists"
+    assert (body["created"], body["failed"]) == (2, 4)
+
+    created = await db.users_collection.find_one({"email": "new3@test.example.com"})
+    assert str(created["_id"]) == body["results"][5]["id"]
+    assert created["role"] == "moderator"
+    assert isinstance(created["password"], bytes) and created["password"] != b"secret"
+
+
+async def test_bulk_create_accepts_ndjson(admin, db):
+    lines = [
+        json.dumps({"email": "a@test.example.com", "password": "x", "full_name": "A"}),
+        "",
+        "{not json",
+    ]
+    response = await admin.post(
+        "/admin/users/bulk-create",
+        files={"file": ("users.ndjson", "\n".join(lines).encode("utf-8"))},
+    )
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "error"]
+    assert await db.users_collection.count_documents({"email": "a@test.example.com"}) == 1
+
+
+async def test_bulk_delete_skips_invalid_ids(admin, db):
+    result = await db.users_collection.insert_many(
+        [{"email": f"gone{i}@test.example.com"} for i in range(3)]
+    )
+    ids = [str(object_id) for object_id in result.inserted_ids]
+    missing = str(ObjectId())
+
+    response = await admin.post(
+        "/admin/users/bulk-delete", json={"user_ids": ids + [missing, "nope"]}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["deleted_count"] == 3
+    assert response.json()["invalid_ids"] == ["nope"]
+    assert await db.users_collection.count_documents({"email": {"$regex": "^gone"}}) == 0
+
+
+async def test_bulk_endpoints_require_admin(client):
+    from tests.conftest import login
+
+    await login(client, "plain@test.example.com")
+
+    response = await client.post("/admin/users/bulk-delete", json={"user_ids": []})
+
+    assert response.status_code == 403
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.services.admission import LLMScheduler, RateLimited, SchedulerBusy
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+def user(role="user"):
+    return {"_id": ObjectId(), "role": role}
+
+
+def scheduler(**options):
+    options = {"limit": 1, "queue_limit": 8, "queue_timeout": 5, "rates": {}, **options}
+    return LLMScheduler(**options)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_released_slots_go_to_admins_then_moderators_then_users():
+    llm = scheduler()
+    await llm.admit(user())
+    order = []
+
+    async def wait(role, name):
+        await llm.admit(user(role))
+        order.append(name)
+
+    waiters = [
+        asyncio.create_task(wait(role, name))
+        for role, name in (
+            ("user", "user 1"), ("moderator", "moderator"), ("user", "user 2"), ("admin", "admin"),
+        )
+    ]
+    await settle()
+    assert llm.stats()["queued"] == {"admin": 1, "moderator": 1, "user": 2}
+
+    for _ in waiters:
+        llm.release()
+        await settle()
+
+    assert order == ["admin", "moderator", "user 1", "user 2"]
+    assert llm.active == 1
+
+
+async def test_a_full_queue_is_refused():
+    llm = scheduler(queue_limit=1)
+    await llm.admit(user())
+    waiter = asyncio.create_task(llm.admit(user()))
+    await settle()
+
+    with pytest.raises(SchedulerBusy) as refused:
+        await llm.admit(user())
+
+    assert refused.value.status_code == 503
+    llm.release()
+    await waiter
+
+
+async def test_a_wait_past_the_queue_timeout_is_refused():
+    llm = scheduler(queue_timeout=0.01)
+    await llm.admit(user())
+
+    with pytest.raises(SchedulerBusy):
+        await llm.admit(user())
+
+    assert llm.depth() == 0
+    llm.release()
+    assert llm.active == 0
+
+
+async def test_a_cancelled_waiter_gives_up_its_place():
+    llm = scheduler()
+    await llm.admit(user())
+    cancelled = asyncio.create_task(llm.admit(user("admin")))
+    waiting = asyncio.create_task(llm.admit(user()))
+    await settle()
+
+    cancelled.cancel()
+    await settle()
+    llm.release()
+    await waiting
+
+    assert llm.active == 1 and llm.depth() == 0
+    llm.release()
+    assert llm.active == 0
+
+
+async def test_a_handed_off_slot_is_held_until_released_once():
+    llm = scheduler()
+
+    async with llm.admission(user()) as admission:
+        release = admission.hand_off()
+    assert llm.active == 1
+
+    release()
+    release()
+    assert llm.active == 0
+
+
+async def test_the_rate_limit_refuses_a_burst():
+    llm = scheduler(limit=8, rates={"user": 60}, burst=2)
+    caller = user()
+    for _ in range(2):
+        await llm.admit(caller)
+
+    with pytest.raises(RateLimited) as limited:
+        await llm.admit(caller)
+
+    assert limited.value.status_code == 429
+    assert limited.value.retry_after >= 1
+    await llm.admit(user())
+
+
+async def test_refusals_carry_retry_after(client, monkeypatch):
+    from app.services.admission import LLM_RETRY_AFTER, llm_scheduler
+
+    monkeypatch.setattr(llm_scheduler, "limit", 0)
+    monkeypatch.setattr(llm_scheduler, "queue_limit", 0)
+    await login(client, "busy@test.example.com")
+
+    response = await client.post("/llm", data={"message": "hello", "cache": "false"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(LLM_RETRY_AFTER)
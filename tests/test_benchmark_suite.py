@@ -0,0 +1,46 @@
+import pytest
+
+from app.benchmarks import suite
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_suite_runs_every_scenario(db):
+    # A few requests per scenario: enough to catch a broken request, not to
+    # measure anything.
+    args = suite.parse_args([
+        "--users", "20", "40",
+        "--concurrency", "4",
+        "--requests", "8",
+        "--login-requests", "4",
+        "--page-size", "10",
+        "--pages", "3",
+        "--csv-rows", "20",
+        "--pdf-pages", "1",
+        "--ingest-repeats", "1",
+        "--llm-requests", "16",
+        "--llm-concurrency", "2",
+        "--sessions", "2",
+    ])
+
+    report = await suite.run(args)
+
+    scenarios = [result["scenario"] for result in report["results"]]
+    assert scenarios == [
+        "login", "user_get",
+        "admin_users_first_page", "admin_users_paging",
+        "admin_users_first_page", "admin_users_paging",
+        "ingest_csv", "ingest_pdf", "llm_chat",
+    ]
+    for result in report["results"]:
+        assert result.get("errors", 0) == 0, result
+        assert "p50_ms" in result, result
+
+
+async def test_login_benchmark_reports_like_the_suite():
+    from app.benchmarks import login
+
+    report = await login.run(concurrency=2, requests=4, rounds=4)
+
+    assert report["requests"] == 4 and report["shed"] == 0
+    assert {"throughput_per_s", "p50_ms", "p95_ms", "p99_ms"} <= set(report)
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.middleware.cancellation import CancellationMiddleware
+from app.utils import deadline
+
+pytestmark = pytest.mark.anyio
+
+
+class Handler:
+    """An ASGI app that reads the body, then works until it is cancelled."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+        self.remaining = None
+
+    async def __call__(self, scope, receive, send):
+        await receive()
+        self.remaining = deadline.remaining()
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class Client:
+    """Sends one request body, then disconnects when told to."""
+
+    def __init__(self):
+        self.body_sent = False
+        self.gone = asyncio.Event()
+        self.sent = []
+
+    async def receive(self):
+        if not self.body_sent:
+            self.body_sent = True
+            return {"type": "http.request", "body": b"message=hi", "more_body": False}
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def request(path):
+    return {"type": "http", "method": "POST", "path": path, "headers": []}
+
+
+async def test_a_disconnect_cancels_the_handler():
+    handler, client = Handler(), Client()
+    middleware = CancellationMiddleware(handler)
+
+    call = asyncio.create_task(middleware(request("/llm"), client.receive, client.send))
+    await handler.started.wait()
+    client.gone.set()
+    await call
+
+    assert handler.cancelled
+    assert client.sent == []
+
+
+async def test_an_expired_deadline_answers_504():
+    handler, client = Handler(), Client()
+    middleware = CancellationMiddleware(handler, routes=[(re.compile(r"^/slow$"), 0.05)])
+
+    await middleware(request("/slow"), client.receive, client.send)
+
+    assert handler.cancelled
+    assert 0 < handler.remaining <= 0.05
+    assert client.sent[0]["status"] == 504
+    assert json.loads(client.sent[1]["body"]) == {"detail": deadline.TIMEOUT_DETAIL}
+
+
+async def test_other_routes_are_not_watched():
+    handler, client = Handler(), Client()
+    middleware = CancellationMiddleware(handler)
+
+    call = asyncio.create_task(middleware(request("/login"), client.receive, client.send))
+    await handler.started.wait()
+    client.gone.set()
+    await asyncio.sleep(0.01)
+
+    assert handler.remaining is None
+    assert not handler.cancelled
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+
+
+def test_a_spent_budget_stops_the_next_stage():
+    token = deadline.start(-1)
+    try:
+        with pytest.raises(deadline.DeadlineExceeded) as exceeded:
+            deadline.check("retrieval")
+        assert exceeded.value.status_code == 504
+        assert exceeded.value.stage == "retrieval"
+        assert deadline.bounded(5) == 0
+    finally:
+        deadline.reset(token)
+
+    assert deadline.remaining() is None
+    deadline.check("retrieval")
+    assert deadline.bounded(5) == 5
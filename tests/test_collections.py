@@ -0,0 +1,89 @@
+import asyncio
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+pytestmark = pytest.mark.anyio
+
+
+def test_merge_top_k_orders_results_across_shards():
+    from app.services.collections import merge_top_k
+
+    distances = np.array([[0.1, 0.4, 0.9], [0.2, 0.3, np.inf], [0.05, 0.6, 0.7]])
+    rows = np.array([[3, 1, 2], [7, 5, -1], [0, 4, 6]])
+
+    assert merge_top_k(distances, rows, 4) == [(2, 0), (0, 3), (1, 7), (1, 5)]
+
+
+def test_merge_top_k_skips_missing_rows():
+    from app.services.collections import merge_top_k
+
+    distances = np.array([[0.1, 0.0], [0.2, 0.3]])
+    rows = np.array([[3, -1], [-1, -1]])
+
+    assert merge_top_k(distances, rows, 4) == [(0, 3)]
+
+
+async def test_collection_roles_only_open_the_owners_documents(db):
+    from app.services import collections
+
+    owner, reader, stranger = ObjectId(), ObjectId(), ObjectId()
+    owned = {"_id": ObjectId(), "owner_id": str(owner), "filename": "owned.csv"}
+    foreign = {"_id": ObjectId(), "owner_id": str(stranger), "filename": "foreign.csv"}
+    private = {"_id": ObjectId(), "owner_id": str(reader), "filename": "private.csv"}
+    await db.documents_collection.insert_many([owned, foreign, private])
+    collection = await collections.create_collection(
+        "shared", owner, [str(owned["_id"]), str(foreign["_id"])], ["moderator"]
+    )
+
+    async def searchable(user):
+        documents = await collections.searchable_documents(collection, user)
+        return {document["filename"] for document in documents}
+
+    assert await searchable({"_id": reader, "role": "moderator"}) == {"owned.csv"}
+    assert await searchable({"_id": reader, "role": "user"}) == set()
+    assert await searchable({"_id": stranger, "role": "user"}) == {"foreign.csv"}
+    assert await searchable({"_id": reader, "role": "admin"}) == {"owned.csv", "foreign.csv"}
+
+
+async def test_a_shard_evicted_while_loading_is_not_cached():
+    from app.services.library import ShardCache
+
+    cache = ShardCache(4)
+    loading, loaded = asyncio.Event(), asyncio.Event()
+
+    async def load(document_id):
+        loading.set()
+        await loaded.wait()
+        return f"shard {document_id}"
+
+    cache.load = load
+    request = asyncio.create_task(cache.get("deleted"))
+    await loading.wait()
+    cache.evict("deleted")
+    loaded.set()
+
+    assert await request == "shard deleted"
+    assert cache.stats()["loaded"] == 0
+
+
+async def test_concurrent_requests_share_one_load():
+    from app.services.library import ShardCache
+
+    cache = ShardCache(4)
+    loads = []
+
+    async def load(document_id):
+        loads.append(document_id)
+        await asyncio.sleep(0)
+        return f"shard {document_id}"
+
+    cache.load = load
+    shards = await asyncio.gather(*[cache.get("shared") for _ in range(3)])
+
+    assert shards == ["shard shared"] * 3
+    assert loads == ["shared"]
+    assert cache.stats() == {"hits": 0, "misses": 1, "loaded": 1}
+    assert await cache.get("shared") == "shard shared"
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.conversation import ConversationStore
+from app.services.prompt import SUMMARY_LOW_WATER, PromptAssembler
+
+pytestmark = pytest.mark.anyio
+
+WINDOW = 6
+
+
+def store(db):
+    return ConversationStore(db.conversations_collection, WINDOW, cache_size=10, idle_seconds=60)
+
+
+async def test_reads_see_turns_written_by_another_worker(db):
+    first, second = store(db), store(db)
+    await first.append("u", "s", "hello", "hi")
+    assert len(await first.get_messages("u", "s")) == 2
+
+    await second.append("u", "s", "again", "hi again")
+
+    messages = await first.get_messages("u", "s")
+    assert [m["content"] for m in messages] == ["hello", "hi", "again", "hi again"]
+
+
+async def test_cached_copy_follows_this_workers_writes(db):
+    conversations = store(db)
+    await conversations.get_state("u", "s")
+
+    await conversations.append("u", "s", "hello", "hi")
+    await conversations.fold("u", "s", [], "greeted")
+
+    state = await conversations.get_state("u", "s")
+    stored = await db.conversations_collection.find_one({"_id": conversations.key("u", "s")})
+    assert state["messages"] == stored["messages"]
+    assert state["summary"] == stored["summary"] == "greeted"
+    assert conversations.cache[conversations.key("u", "s")]["version"] == stored["version"] == 2
+
+
+async def test_unsummarised_turns_are_never_trimmed(db):
+    conversations = store(db)
+    for turn in range(WINDOW):
+        await conversations.append("u", "s", f"question {turn}", f"answer {turn}")
+
+    assert len(await conversations.get_messages("u", "s")) == 2 * WINDOW
+
+
+async def test_turns_past_the_window_are_summarised_before_they_go(db):
+    conversations = store(db)
+    for turn in range(WINDOW):
+        await conversations.append("u", "s", f"question {turn}", f"answer {turn}")
+    summarised = []
+
+    async def summarize(summary, messages):
+        summarised.extend(m["content"] for m in messages)
+        return f"{len(summarised)} messages"
+
+    history, usage = await PromptAssembler(conversations, summarize).fit_history("u", "s", 6000)
+
+    kept = int(WINDOW * SUMMARY_LOW_WATER)
+    remaining = await conversations.get_messages("u", "s")
+    assert len(remaining) == usage["messages_used"] == kept
+    assert usage["messages_folded"] == 2 * WINDOW - kept
+    everything = [c for turn in range(WINDOW) for c in (f"question {turn}", f"answer {turn}")]
+    assert summarised + [m["content"] for m in remaining] == everything
+    assert history[0].content.endswith(f"{2 * WINDOW - kept} messages")
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+from app.services.embedding_batcher import BatchingEmbeddings, MicroBatcher
+from app.services.fakes import FakeEmbeddings
+
+pytestmark = pytest.mark.anyio
+
+
+class BlockedBackend:
+    """An embedding backend whose calls wait until ``finish()``."""
+
+    def __init__(self):
+        self.calls = []
+        self.cancelled = 0
+        self.called = asyncio.Event()
+        self.gate = asyncio.Event()
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        self.called.set()
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return [[float(len(text))] for text in texts]
+
+    def finish(self):
+        self.gate.set()
+
+
+def batching_fake():
+    backend = FakeEmbeddings(latency_ms=0)
+    return backend, BatchingEmbeddings(backend, backend.aembed_documents)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_concurrent_queries_share_one_backend_call():
+    backend, embeddings = batching_fake()
+    texts = [f"question {i}" for i in range(10)]
+
+    vectors = await asyncio.gather(*[embeddings.aembed_query(text) for text in texts])
+
+    assert backend.calls == [10]
+    assert vectors == [backend.vector(text) for text in texts]
+
+
+async def test_duplicate_texts_are_sent_once():
+    backend, embeddings = batching_fake()
+
+    first, second = await asyncio.gather(
+        embeddings.aembed_documents(["a", "b"]),
+        embeddings.aembed_documents(["b", "c", "c"]),
+    )
+
+    assert backend.calls == [3]
+    assert first == [backend.vector("a"), backend.vector("b")]
+    assert second == [backend.vector("b"), backend.vector("c"), backend.vector("c")]
+    assert embeddings.stats()["documents"]["deduplicated"] == 2
+
+
+async def test_a_text_in_flight_is_not_sent_again():
+    backend = BlockedBackend()
+    batcher = MicroBatcher(backend, window=0)
+
+    first = asyncio.create_task(batcher.embed(["a"]))
+    await backend.called.wait()
+    second = asyncio.create_task(batcher.embed(["a"]))
+    await settle()
+    backend.finish()
+
+    assert await first == await second == [[1.0]]
+    assert backend.calls == [["a"]]
+
+
+async def test_a_full_batch_is_sent_without_waiting():
+    backend = BlockedBackend()
+    batcher = MicroBatcher(backend, max_batch=2, window=60)
+
+    caller = asyncio.create_task(batcher.embed(["a", "b", "c"]))
+    await backend.called.wait()
+
+    assert backend.calls == [["a", "b"]]
+    assert list(batcher.pending) == ["c"]
+    batcher.flush()
+    backend.finish()
+    assert await caller == [[1.0], [1.0], [1.0]]
+
+
+async def test_a_cancelled_callers_text_leaves_the_pending_batch():
+    backend = BlockedBackend()
+    batcher = MicroBatcher(backend, window=60)
+
+    leaving = asyncio.create_task(batcher.embed(["gone"]))
+    staying = asyncio.create_task(batcher.embed(["kept"]))
+    await settle()
+    leaving.cancel()
+    await settle()
+
+    assert list(batcher.pending) == ["kept"]
+    assert batcher.stats()["abandoned"] == 1
+    batcher.flush()
+    backend.finish()
+    assert await staying == [[4.0]]
+    assert backend.calls == [["kept"]]
+
+
+class FlakyBackend:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("backend unavailable")
+        return [[1.0] for _ in texts]
+
+
+async def test_failed_batches_are_retried():
+    backend = FlakyBackend(failures=2)
+    batcher = MicroBatcher(backend, window=0, retries=2, backoff=0)
+
+    assert await batcher.embed(["a"]) == [[1.0]]
+    assert backend.calls == 3
+    assert batcher.stats()["retried"] == 2
+
+
+async def test_every_caller_sees_the_final_failure():
+    backend = FlakyBackend(failures=3)
+    batcher = MicroBatcher(backend, window=0, retries=1, backoff=0)
+
+    results = await asyncio.gather(
+        batcher.embed(["a"]), batcher.embed(["a", "b"]), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError]
+    assert backend.calls == 2
+    assert batcher.stats()["in_flight"] == 0
+
+
+async def test_a_batch_nobody_waits_for_is_cancelled():
+    backend = BlockedBackend()
+    batcher = MicroBatcher(backend, window=0)
+
+    caller = asyncio.create_task(batcher.embed(["a", "b"]))
+    await backend.called.wait()
+    caller.cancel()
+    await asyncio.gather(*batcher.tasks, return_exceptions=True)
+
+    assert backend.cancelled == 1
+    assert batcher.stats()["abandoned"] == 2
+    assert batcher.stats()["in_flight"] == 0
+
+
+async def test_a_batch_still_wanted_by_someone_is_kept():
+    backend = BlockedBackend()
+    batcher = MicroBatcher(backend, window=0)
+
+    leaving = asyncio.create_task(batcher.embed(["a"]))
+    staying = asyncio.create_task(batcher.embed(["a"]))
+    await backend.called.wait()
+    leaving.cancel()
+    await asyncio.sleep(0)
+    backend.finish()
+
+    assert await staying == [[1.0]]
+    assert backend.cancelled == 0
+    assert batcher.stats()["abandoned"] == 0
@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.services.embedding_cache import WAYS, EmbeddingCache, cache_key
+
+DIM = 8
+
+
+def vector(seed):
+    return np.random.default_rng(seed).random(DIM, dtype=np.float32)
+
+
+def keys(count):
+    return [cache_key("model", f"text {i}") for i in range(count)]
+
+
+def test_vectors_survive_a_restart(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+    items = [(key, vector(i)) for i, key in enumerate(keys(10))]
+    cache.put_many(items)
+
+    reopened = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+
+    found = reopened.get_many([key for key, _ in items])
+    for (_, expected), actual in zip(items, found):
+        np.testing.assert_array_equal(actual, expected)
+    assert reopened.stats()["disk_entries"] == 10
+
+
+def test_workers_share_the_table(tmp_path):
+    # Separate instances stand in for separate processes: each has its own
+    # hot tier, memory map and lock file descriptor.
+    first = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+    second = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+    key = keys(1)[0]
+
+    # The second worker looked before the table existed.
+    assert second.get_many([key]) == [None]
+    first.put_many([(key, vector(1))])
+
+    np.testing.assert_array_equal(second.get_many([key])[0], vector(1))
+
+
+def test_a_reused_slot_reads_as_a_miss(tmp_path):
+    # Room for a single set, so every key competes for the same rows.
+    row_bytes = EmbeddingCache._dtype(DIM).itemsize
+    writer = EmbeddingCache(str(tmp_path), row_bytes * WAYS, hot_size=1)
+    reader = EmbeddingCache(str(tmp_path), row_bytes * WAYS, hot_size=1)
+    all_keys = keys(3 * WAYS)
+
+    for i, key in enumerate(all_keys):
+        writer.put_many([(key, vector(i))])
+
+    found = reader.get_many(all_keys)
+    assert all(v is None for v in found[:-WAYS])
+    for i, actual in enumerate(found[-WAYS:], start=len(all_keys) - WAYS):
+        np.testing.assert_array_equal(actual, vector(i))
+    assert writer.stats()["evictions"] == 2 * WAYS
+
+
+def test_other_widths_stay_in_memory(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+    short, wide = keys(2)
+    cache.put_many([(short, vector(1))])
+    cache.put_many([(wide, np.ones(DIM * 2, dtype=np.float32))])
+
+    reopened = EmbeddingCache(str(tmp_path), 1 << 20, hot_size=4)
+
+    assert reopened.get_many([wide]) == [None]
+    assert cache.get_many([wide])[0].shape == (DIM * 2,)
+    assert reopened.dim == DIM
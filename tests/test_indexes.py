@@ -0,0 +1,35 @@
+import pytest
+
+from app.repositories.indexes import INDEXES, ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_ensure_indexes_creates_every_index(db):
+    assert await ensure_indexes() == []
+
+    for collection, models in INDEXES:
+        existing = await collection.index_information()
+        for model in models:
+            assert model.document["name"] in existing
+    info = await db.users_collection.index_information()
+    assert info["email_unique"]["unique"] is True
+
+
+async def test_ensure_indexes_is_idempotent(db):
+    await ensure_indexes()
+
+    assert await ensure_indexes() == []
+
+
+async def test_ensure_indexes_reports_what_it_could_not_build(db):
+    await db.users_collection.insert_many(
+        [{"email": "dup@test.example.com"}, {"email": "dup@test.example.com"}]
+    )
+
+    missing = await ensure_indexes()
+
+    # createIndexes is all-or-nothing per collection; the others still build.
+    name = db.users_collection.name
+    assert f"{name}.email_unique" in missing
+    assert all(index.startswith(f"{name}.") for index in missing)
@@ -0,0 +1,197 @@
+import asyncio
+
+import httpx
+import pytest
+from bson import ObjectId
+
+from app.benchmarks.suite import synthetic_csv
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+class BlockedIngest:
+    """Stands in for ingestion; every job waits until ``finish()``."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.running = {}
+
+    async def create_document(self, upload, owner_id, on_progress=None):
+        self.running[owner_id] = self.running.get(owner_id, 0) + 1
+        await self.gate.wait()
+        return {"_id": ObjectId()}
+
+    async def finish(self):
+        self.gate.set()
+        await finish_jobs()
+
+
+@pytest.fixture
+def blocked_ingest(monkeypatch):
+    from app.services import jobs
+
+    blocked = BlockedIngest()
+    monkeypatch.setattr(jobs.library, "create_document", blocked.create_document)
+    return blocked
+
+
+async def submit(client, seed):
+    return await client.post(
+        "/rag/jobs", files={"file": ("data.csv", synthetic_csv(5, seed))}
+    )
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def finish_jobs():
+    from app.services import jobs
+
+    await asyncio.gather(*list(jobs._tasks.values()), return_exceptions=True)
+
+
+async def test_quota_is_per_user(app, client, blocked_ingest):
+    from app.services import jobs
+
+    await login(client, "busy@test.example.com")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as other:
+        await login(other, "other@test.example.com")
+
+        for seed in range(jobs.JOB_QUOTAS["user"] + 1):
+            assert (await submit(client, seed)).status_code == 202
+        assert (await submit(other, 99)).status_code == 202
+        await settle()
+
+    # The busy user's extra job waits; the other user's job is not stuck
+    # behind it.
+    assert sorted(blocked_ingest.running.values()) == [1, jobs.JOB_QUOTAS["user"]]
+    await blocked_ingest.finish()
+    assert sorted(blocked_ingest.running.values()) == [1, jobs.JOB_QUOTAS["user"] + 1]
+
+
+async def test_queue_is_bounded_per_user(client, blocked_ingest, monkeypatch):
+    from app.services import jobs
+
+    monkeypatch.setattr(jobs, "JOB_QUEUE_LIMIT", 1)
+    await login(client, "queue@test.example.com")
+
+    for seed in range(jobs.JOB_QUOTAS["user"] + 1):
+        assert (await submit(client, seed)).status_code == 202
+    response = await submit(client, 100)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(jobs.JOB_RETRY_AFTER)
+    await blocked_ingest.finish()
+
+
+async def test_jobs_release_their_quota(client, db, monkeypatch):
+    from app.services import jobs
+
+    async def create_document(upload, owner_id, on_progress=None):
+        return {"_id": ObjectId()}
+
+    monkeypatch.setattr(jobs.library, "create_document", create_document)
+    await login(client, "done@test.example.com")
+
+    assert (await submit(client, 1)).status_code == 202
+    await finish_jobs()
+
+    assert jobs._quotas == {}
+    assert await db.jobs_collection.count_documents({"status": "completed"}) == 1
+
+
+async def test_stale_active_jobs_are_failed(db):
+    from app.services import jobs
+
+    old = jobs.now() - jobs.JOB_STALE_SECONDS - 10
+    await db.jobs_collection.insert_many([
+        {"_id": "queued", "status": "queued", "updated_at": old},
+        {"_id": "running", "status": "running", "updated_at": old},
+        {"_id": "live", "status": "running", "updated_at": jobs.now()},
+        {"_id": "done", "status": "completed", "updated_at": old},
+    ])
+
+    assert await jobs.fail_stale_jobs() == 2
+
+    statuses = {job["_id"]: job["status"] async for job in db.jobs_collection.find()}
+    assert statuses == {
+        "queued": "failed", "running": "failed", "live": "running", "done": "completed",
+    }
+
+
+async def test_stale_jobs_are_failed_without_a_restart(db):
+    from app.services import jobs
+
+    await db.jobs_collection.insert_one(
+        {"_id": "orphan", "status": "running", "updated_at": jobs.now() - jobs.JOB_STALE_SECONDS - 10}
+    )
+    sweeper = asyncio.create_task(jobs.run_stale_sweeper(interval=0))
+    try:
+        for _ in range(50):
+            job = await db.jobs_collection.find_one({"_id": "orphan"})
+            if job["status"] == "failed":
+                break
+            await asyncio.sleep(0)
+    finally:
+        sweeper.cancel()
+
+    assert job["status"] == "failed"
+
+
+async def test_a_cancelled_job_keeps_no_document(client, db, monkeypatch):
+    from app.services import jobs
+
+    completing = asyncio.Event()
+    update_job = jobs.update_job
+
+    async def create_document(upload, owner_id, on_progress=None):
+        document = {"_id": ObjectId(), "owner_id": str(owner_id)}
+        await db.documents_collection.insert_one(document)
+        return document
+
+    async def slow_update_job(job_id, fields):
+        if fields.get("status") == "completed":
+            completing.set()
+            await asyncio.Event().wait()
+        await update_job(job_id, fields)
+
+    monkeypatch.setattr(jobs.library, "create_document", create_document)
+    monkeypatch.setattr(jobs, "update_job", slow_update_job)
+    await login(client, "late@test.example.com")
+    job_id = (await submit(client, 1)).json()["job_id"]
+
+    await completing.wait()
+    jobs._tasks[ObjectId(job_id)].cancel()
+    await finish_jobs()
+
+    job = await db.jobs_collection.find_one({"_id": ObjectId(job_id)})
+    assert job["status"] == "cancelled"
+    assert await db.documents_collection.count_documents({}) == 0
+
+
+async def test_a_document_saved_for_a_cancelled_caller_is_deleted(db):
+    from app.services import library
+
+    saving, saved = asyncio.Event(), asyncio.Event()
+
+    async def save():
+        saving.set()
+        await saved.wait()
+        document = {"_id": ObjectId(), "owner_id": "owner"}
+        await db.documents_collection.insert_one(document)
+        return document
+
+    task = asyncio.create_task(library.save_or_discard(save()))
+    await saving.wait()
+    task.cancel()
+    await settle()
+    saved.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert await db.documents_collection.count_documents({}) == 0
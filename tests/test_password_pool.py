@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils import passwords
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_logins_are_shed_while_bulk_hashing_fills_the_pool(monkeypatch):
+    hashing = threading.Event()
+    release = threading.Event()
+
+    def blocked_hash(password):
+        hashing.set()
+        release.wait(5)
+        return password.encode("utf-8")
+
+    hashed = passwords.hash_password(PASSWORD, 4)
+    monkeypatch.setattr(passwords, "BCRYPT_WORKERS", 2)
+    monkeypatch.setattr(passwords, "BCRYPT_QUEUE_LIMIT", 0)
+    monkeypatch.setattr(passwords, "bulk_semaphore", asyncio.Semaphore(2))
+    monkeypatch.setattr(passwords, "hash_password", blocked_hash)
+
+    bulk = asyncio.create_task(passwords.hash_passwords(["a", "b", "c"]))
+    try:
+        for _ in range(1000):
+            if passwords.pool_stats()["pending"] == 2:
+                break
+            await asyncio.sleep(0.001)
+
+        with pytest.raises(passwords.PasswordPoolBusy):
+            await passwords.verify_password(PASSWORD, hashed)
+    finally:
+        release.set()
+
+    assert await bulk == [b"a", b"b", b"c"]
+    assert passwords.pool_stats()["pending"] == 0
+    assert await passwords.verify_password(PASSWORD, hashed)
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app.repositories import user_repository
+from app.utils import passwords
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+EMAIL = "rehash@test.example.com"
+
+
+async def insert_user(users_collection, rounds):
+    hashed = passwords.hash_password(PASSWORD, rounds)
+    result = await users_collection.insert_one(
+        {"email": EMAIL, "password": hashed, "full_name": "Rehash", "role": "user"}
+    )
+    return result.inserted_id, hashed
+
+
+async def finish_rehashes():
+    await asyncio.gather(*passwords._rehash_tasks)
+
+
+async def test_login_upgrades_an_old_hash(client, db):
+    user_id, old = await insert_user(db.users_collection, passwords.BCRYPT_ROUNDS + 1)
+
+    response = await client.post("/login/", json={"email": EMAIL, "password": PASSWORD})
+    await finish_rehashes()
+
+    assert response.status_code == 200
+    stored = (await db.users_collection.find_one({"_id": user_id}))["password"]
+    assert stored != old
+    assert passwords.hash_rounds(stored) == passwords.BCRYPT_ROUNDS
+    assert passwords.check_password(PASSWORD, stored)
+
+
+async def test_rehash_never_overwrites_a_newer_password(db):
+    user_id, old = await insert_user(db.users_collection, passwords.BCRYPT_ROUNDS)
+    changed = passwords.hash_password("changed-meanwhile")
+    await db.users_collection.update_one({"_id": user_id}, {"$set": {"password": changed}})
+
+    modified = await user_repository.replace_password(
+        user_id, old, passwords.hash_password(PASSWORD)
+    )
+
+    assert modified == 0
+    assert (await db.users_collection.find_one({"_id": user_id}))["password"] == changed
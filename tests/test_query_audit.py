@@ -0,0 +1,124 @@
+import pytest
+from bson import ObjectId
+
+from app.repositories import query_audit, user_repository
+
+pytestmark = pytest.mark.anyio
+
+SPIED = ("find", "find_one", "count_documents", "update_many")
+
+
+def shape(value):
+    """A filter with its values replaced by their types; ``$in`` and
+    ``$and`` lists of any length compare equal."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, shape(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return frozenset(shape(item) for item in value)
+    return type(value).__name__
+
+
+@pytest.fixture
+def issued(db, monkeypatch):
+    filters = set()
+    for collection in (
+        db.users_collection,
+        db.documents_collection,
+        db.jobs_collection,
+        db.collections_collection,
+    ):
+        for method in SPIED:
+            def spy(query, *args, _original=getattr(collection, method), _name=collection.name, **kwargs):
+                filters.add((_name, shape(query)))
+                return _original(query, *args, **kwargs)
+
+            monkeypatch.setattr(collection, method, spy)
+    return filters
+
+
+def audited():
+    return {
+        (item["collection"].name, shape(item["filter"])) for item in query_audit.query_shapes()
+    }
+
+
+async def test_audit_covers_the_user_listings(db, issued):
+    await db.users_collection.insert_many([
+        {"email": f"audit{i}@test.example.com", "role": "user", "created_at": i}
+        for i in range(3)
+    ])
+    for sort in user_repository.SORT_KEYS:
+        for query in (
+            user_repository.listing_filter(),
+            user_repository.listing_filter(role="user"),
+            user_repository.listing_filter(email_prefix="audit"),
+        ):
+            _, cursor = await user_repository.find_page(query, sort, limit=1)
+            await user_repository.find_page(query, sort, cursor, limit=1)
+    user = await user_repository.find_by_email("audit0@test.example.com")
+    await user_repository.find_by_id(user["_id"])
+    await user_repository.token_versions([user["_id"]])
+
+    assert (db.users_collection.name, shape({"$and": [{}, {"_id": {"$gt": ObjectId()}}]})) in issued
+    assert issued <= audited()
+
+
+async def test_audit_covers_documents_jobs_and_collections(db, issued):
+    from app.services import collections, jobs, library
+
+    user = {"_id": ObjectId(), "role": "user"}
+    document_id = ObjectId()
+    await db.documents_collection.insert_one({"_id": document_id, "owner_id": str(user["_id"])})
+    collection = await collections.create_collection("audit", user["_id"], [str(document_id)], [])
+
+    await collections.searchable_documents(collection, user)
+    await collections.get_collection(str(collection["_id"]))
+    for current_user in (user, {"_id": ObjectId(), "role": "admin"}):
+        await collections.list_collections(current_user)
+    await library.find_ingested("0" * 64)
+    await library.get_document(str(document_id))
+    for owner_id in (user["_id"], None):
+        await library.list_documents(owner_id)
+        await jobs.list_jobs(owner_id)
+    await jobs.get_job(str(ObjectId()))
+    await jobs.check_queue(user["_id"], "user")
+    await jobs.fail_stale_jobs()
+    await library.delete_document(str(document_id))
+
+    assert (db.documents_collection.name, shape({"_id": {"$in": [document_id]}})) in issued
+    assert issued <= audited()
+
+
+class ExplainedCollection:
+    name = "audit"
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query):
+        return self
+
+    def sort(self, keys):
+        return self
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+async def test_explain_flags_unexpected_collection_scans():
+    collscan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    ixscan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+
+    flagged = await query_audit.explain_shape(
+        {"name": "scan", "collection": ExplainedCollection(collscan), "filter": {}, "sort": [("a", 1)]}
+    )
+    allowed = await query_audit.explain_shape(
+        {"name": "scan", "collection": ExplainedCollection(collscan), "filter": {}, "allow_collscan": True}
+    )
+    indexed = await query_audit.explain_shape(
+        {"name": "index", "collection": ExplainedCollection(ixscan), "filter": {}}
+    )
+
+    assert flagged["stages"] == ["SORT", "COLLSCAN"] and flagged["flagged"]
+    assert allowed["collscan"] and not allowed["flagged"]
+    assert indexed == {"name": "index", "stages": ["FETCH", "IXSCAN"], "collscan": False, "flagged": False}
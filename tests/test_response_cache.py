@@ -0,0 +1,23 @@
+import pytest
+
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+async def ask(client, message, session_id):
+    response = await client.post(
+        "/llm", data={"message": message, "session_id": session_id, "cache": "true"}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["cache"]
+
+
+async def test_answers_are_reused_only_for_the_same_history(client):
+    await login(client, "cache@test.example.com")
+
+    assert await ask(client, "continue", "first") == "miss"
+    # Same question, but the session now holds the first exchange.
+    assert await ask(client, "continue", "first") == "miss"
+    # A fresh session has the same (empty) history as the first request.
+    assert await ask(client, "continue", "second") == "exact"
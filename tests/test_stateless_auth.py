@@ -0,0 +1,88 @@
+from http.cookies import SimpleCookie
+
+import httpx
+import pytest
+from fastapi import Response
+
+from app.middleware import authentication
+from app.utils import tokens
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def stateless(monkeypatch):
+    monkeypatch.setattr(tokens, "AUTH_STATELESS", True)
+    monkeypatch.setattr(authentication, "AUTH_STATELESS", True)
+
+
+async def sign_in(app, db, email, role):
+    from app.utils.passwords import hash_password
+
+    result = await db.users_collection.insert_one({
+        "email": email,
+        "password": hash_password(PASSWORD),
+        "full_name": email.split("@")[0],
+        "role": role,
+        "created_at": 0,
+    })
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post("/login/", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return str(result.inserted_id), response.cookies["access_token"], response.cookies["refresh_token"]
+
+
+def claims(access_token):
+    return tokens.verify_token(access_token, tokens.ACCESS_TOKEN_SECRET)
+
+
+def issued_access_token(response):
+    cookies = SimpleCookie(response.headers["set-cookie"])
+    return cookies["access_token"].value
+
+
+async def test_a_demoted_users_token_is_rejected_and_refreshed_with_the_new_role(
+    stateless, app, db, admin
+):
+    user_id, access, refresh = await sign_in(app, db, "demoted@test.example.com", "moderator")
+    assert claims(access)["role"] == "moderator"
+    assert (await authentication.resolve_user(Response(), access, None))["role"] == "moderator"
+
+    response = await admin.put(f"/admin/users/{user_id}/role", json={"role": "user"})
+    assert response.status_code == 200
+
+    assert await authentication.resolve_user(Response(), access, None) is None
+    refreshed = Response()
+    user = await authentication.resolve_user(refreshed, access, refresh)
+    assert user["role"] == "user"
+    new_access = issued_access_token(refreshed)
+    assert claims(new_access)["role"] == "user"
+    assert claims(new_access)["tv"] == 1
+    assert (await authentication.resolve_user(Response(), new_access, None))["role"] == "user"
+
+
+async def test_a_deleted_users_tokens_are_rejected(stateless, app, db, admin):
+    user_id, access, refresh = await sign_in(app, db, "deleted@test.example.com", "user")
+    assert await authentication.resolve_user(Response(), access, None) is not None
+
+    response = await admin.delete(f"/delete_user/{user_id}")
+    assert response.status_code == 200
+
+    assert await authentication.resolve_user(Response(), access, None) is None
+    assert await authentication.resolve_user(Response(), access, refresh) is None
+
+
+async def test_a_revoked_token_is_refused_by_the_api(stateless, app, db, admin):
+    user_id, access, _ = await sign_in(app, db, "revoked@test.example.com", "moderator")
+    await admin.put(f"/admin/users/{user_id}/role", json={"role": "user"})
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test",
+        cookies={"access_token": access},
+    ) as client:
+        response = await client.get(f"/user/{user_id}")
+
+    assert response.status_code == 401
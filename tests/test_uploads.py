@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from app.benchmarks.suite import synthetic_csv
+from tests.conftest import login
+
+pytestmark = pytest.mark.anyio
+
+
+def upload_files():
+    from app.utils import uploads
+
+    if not os.path.isdir(uploads.UPLOAD_DIR):
+        return []
+    return os.listdir(uploads.UPLOAD_DIR)
+
+
+async def upload(client, payload, name="data.csv"):
+    return await client.post("/rag/documents", files={"file": (name, payload)})
+
+
+async def test_identical_content_is_ingested_once(client, monkeypatch):
+    from app.services import library
+
+    await login(client, "dedup@test.example.com")
+    payload = synthetic_csv(30, seed=1)
+    first = await upload(client, payload)
+    assert first.status_code == 201, first.text
+
+    async def no_ingest(*args, **kwargs):
+        raise AssertionError("identical content was ingested again")
+
+    monkeypatch.setattr(library, "document_loader", no_ingest)
+    second = await upload(client, payload, name="copy.csv")
+
+    assert second.status_code == 201, second.text
+    first, second = first.json()["data"], second.json()["data"]
+    assert first["id"] != second["id"]
+    assert second["filename"] == "copy.csv"
+    assert (second["sha256"], second["chunks"]) == (first["sha256"], first["chunks"])
+
+    # Each document owns its files: deleting one leaves the other queryable.
+    assert (await client.delete(f"/rag/documents/{first['id']}")).status_code == 200
+    library.shard_cache.evict(second["id"])
+    vectorstore = await library.load_vectorstore(second["id"])
+    assert vectorstore.index.ntotal == second["chunks"]
+
+
+async def test_uploads_are_removed_after_the_request(client):
+    await login(client, "cleanup@test.example.com")
+
+    response = await upload(client, synthetic_csv(5, seed=2))
+
+    assert response.status_code == 201, response.text
+    assert upload_files() == []
+
+
+async def test_oversized_upload_is_rejected_without_leftovers(client, monkeypatch):
+    from app.utils import uploads
+
+    await login(client, "large@test.example.com")
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 100)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+
+    response = await upload(client, synthetic_csv(50, seed=3))
+
+    assert response.status_code == 413
+    assert upload_files() == []
+
+
+async def test_unsupported_type_is_rejected(client):
+    await login(client, "type@test.example.com")
+
+    response = await upload(client, b"\x00\x01binary", name="blob.csv")
+
+    assert response.status_code == 415
+    assert upload_files() == []
@@ -0,0 +1,113 @@
+import pytest
+from bson import ObjectId
+
+from app.repositories import user_repository
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed(users_collection, count, created_at=lambda i: i // 3):
+    # Several users share each created_at, so the _id tie-break is exercised.
+    documents = [
+        {
+            "_id": ObjectId(),
+            "email": f"user{i}@test.example.com",
+            "password": b"hash",
+            "full_name": f"User {i}",
+            "role": "moderator" if i % 4 == 0 else "user",
+            "created_at": created_at(i),
+        }
+        for i in range(count)
+    ]
+    await users_collection.insert_many(documents)
+    return documents
+
+
+async def walk(query, sort, limit):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = await user_repository.find_page(query, sort, cursor, limit)
+        seen.extend(page)
+        pages += 1
+        if cursor is None:
+            return seen, pages
+
+
+@pytest.mark.parametrize("sort", ["_id", "created_at"])
+async def test_find_page_walks_every_user_once_in_order(db, sort):
+    documents = await seed(db.users_collection, 25)
+
+    seen, pages = await walk({}, sort, limit=4)
+
+    keys = [key for key, _ in user_repository.SORT_KEYS[sort]]
+    expected = sorted(documents, key=lambda d: tuple(d[key] for key in keys))
+    assert [user["_id"] for user in seen] == [d["_id"] for d in expected]
+    assert pages == 7
+
+
+async def test_find_page_applies_the_filter_on_every_page(db):
+    documents = await seed(db.users_collection, 25)
+    query = user_repository.listing_filter(role="moderator")
+
+    seen, _ = await walk(query, "created_at", limit=2)
+
+    assert {user["_id"] for user in seen} == {
+        d["_id"] for d in documents if d["role"] == "moderator"
+    }
+
+
+async def test_find_page_has_no_cursor_on_an_exact_last_page(db):
+    await seed(db.users_collection, 4)
+
+    page, cursor = await user_repository.find_page({}, "_id", None, 4)
+
+    assert len(page) == 4
+    assert cursor is None
+
+
+async def test_find_page_never_returns_the_password(db):
+    await seed(db.users_collection, 3)
+
+    page, _ = await user_repository.find_page({}, "_id", None, 10)
+
+    assert all("password" not in user for user in page)
+
+
+async def test_cursor_round_trips(db):
+    user = {"_id": ObjectId(), "created_at": 17}
+
+    position = user_repository.decode_cursor(user_repository.encode_cursor(user, "created_at"))
+
+    assert position == user
+
+
+async def test_admin_listing_advertises_the_next_page(admin, db):
+    await seed(db.users_collection, 9)
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 4, "sort": "created_at"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await admin.get("/admin/users", params=params)
+        assert response.status_code == 200
+        ids.extend(user["id"] for user in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # The nine seeded users and the admin the fixture logged in as.
+    assert len(ids) == len(set(ids)) == 10
+
+
+async def test_find_page_keeps_users_without_created_at(db):
+    # Users created before created_at was recorded sort first and must not
+    # be skipped once the cursor is past them.
+    documents = await seed(db.users_collection, 5, created_at=lambda i: i)
+    legacy = [{"_id": ObjectId(), "email": f"legacy{i}@test.example.com"} for i in range(5)]
+    await db.users_collection.insert_many(legacy)
+
+    seen, _ = await walk({}, "created_at", limit=2)
+
+    expected = sorted(legacy, key=lambda d: d["_id"]) + documents
+    assert [user["_id"] for user in seen] == [d["_id"] for d in expected]
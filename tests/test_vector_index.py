@@ -0,0 +1,53 @@
+import faiss
+import pytest
+
+from app.benchmarks.suite import synthetic_csv
+from app.services import vector_index
+from tests.conftest import login
+
+
+def test_select_type_by_document_size():
+    flat_max, pq_min = vector_index.VECTOR_INDEX_FLAT_MAX, vector_index.VECTOR_INDEX_PQ_MIN
+
+    assert vector_index.select_type(flat_max - 1) == "flat"
+    assert vector_index.select_type(flat_max) == "ivf_fp16"
+    assert vector_index.select_type(pq_min) == "ivf_pq"
+    # The IVF-PQ codebooks can always be trained once IVF is selected.
+    assert flat_max >= vector_index.MIN_TRAINED_COUNT
+
+
+def test_select_type_compresses_small_documents_of_a_large_corpus():
+    corpus = vector_index.VECTOR_INDEX_COMPRESS_MIN
+
+    assert vector_index.select_type(100, corpus - 1) == "flat"
+    assert vector_index.select_type(100, corpus) == "flat_fp16"
+    assert vector_index.select_type(vector_index.VECTOR_INDEX_FLAT_MAX, corpus) == "ivf_fp16"
+
+
+@pytest.mark.anyio
+async def test_large_document_is_stored_and_served_as_ivf(client, monkeypatch):
+    from app.services import library
+
+    # A smaller threshold keeps the test fast; the path is the same.
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_FLAT_MAX", 500)
+    await login(client, "ivf@test.example.com")
+
+    response = await client.post(
+        "/rag/documents", files={"file": ("large.csv", synthetic_csv(800, seed=7))}
+    )
+
+    assert response.status_code == 201, response.text
+    document = response.json()["data"]
+    assert document["index_type"] == "ivf_fp16"
+    assert document["chunks"] >= 800
+
+    library.shard_cache.evict(document["id"])
+    vectorstore = await library.load_vectorstore(document["id"])
+    ivf = faiss.extract_index_ivf(vectorstore.index)
+    assert ivf.nprobe == vector_index.VECTOR_INDEX_NPROBE
+    assert vectorstore.index.ntotal == document["chunks"]
+
+    answer = await client.post(
+        f"/rag/documents/{document['id']}/query", data={"message": "revenue by region"}
+    )
+    assert answer.status_code == 200, answer.text